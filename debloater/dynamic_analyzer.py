@@ -1,5 +1,10 @@
 #!/usr/bin/env python3
+import os
 import random
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
 import jpamb
 from jpamb import jvm
 from debloater.interpreter import Frame, State, Stack, step #Interpreter  # your interpreter
@@ -26,50 +31,77 @@ from debloater.syntactic.combined_input_generator import CombinedInputGenerator
 # frame = Frame.from_method(methodid)
 # state = State({}, Stack.empty().push(frame))
 
+# The heap hands out consecutive addresses, so the next free one is its size
+def _heap_alloc(state, obj):
+    addr = len(state.heap)
+    state.heap[addr] = obj
+    return addr
+
 #trying to get input generator to work
 # the random input generator returns strings and the dynamic analyzer uses JVM runtime values
+
+#for bools
+def _bool_from_text(text, param_type, state):
+    return jvm.Value.int(1 if text.lower() == "true" else 0)
+
+#for ints (dont have handling for doubles and longs because they take up two spaces on stack and dont have any byte cases)
+def _int_from_text(text, param_type, state):
+    return jvm.Value.int(int(text))
+
+#for floats
+_FLOAT_TEXT = {"NaN": float("nan"), "Infinity": float("inf"), "- Infinity": float("-inf")}
+
+def _float_from_text(text, param_type, state):
+    val = _FLOAT_TEXT.get(text)
+    return jvm.Value.float(val if val is not None else float(text))
+
+#dont have any tests for char, doubles, longs, and bytes so i am not making the conversion
+
+#for arrays
+_ARRAY_TOKEN = re.compile(r"[\[\],]|[^\[\],]+")
+
+def _array_from_text(text, param_type, state):
+    # one pass over the tokens, keeping the arrays still open (and their types)
+    # on a stack instead of recursing per nesting level
+    open_arrays = []  # (array type, elements so far)
+    value = None
+    for tok in _ARRAY_TOKEN.findall(text):
+        if tok == "[":
+            arr_type = open_arrays[-1][0].contains if open_arrays else param_type
+            open_arrays.append((arr_type, []))
+        elif tok == "]":
+            arr_type, heapArr = open_arrays.pop()
+            addr = _heap_alloc(state, heapArr)
+            value = jvm.Value(jvm.Reference(arr_type), addr)
+            if open_arrays:
+                open_arrays[-1][1].append(value)
+        elif tok != ",":
+            tok = tok.strip()
+            if tok and open_arrays:
+                inner_type = open_arrays[-1][0].contains
+                open_arrays[-1][1].append(converStringToJvmValue(tok, inner_type, state))
+    return value
+
+def _ref_from_text(text, param_type, state):
+    return jvm.Value(jvm.Reference(param_type), None)
+
+# conversion for each parameter type, looked up once per value
+_FROM_TEXT = {
+    jvm.Boolean: _bool_from_text,
+    jvm.Int: _int_from_text,
+    jvm.Float: _float_from_text,
+    jvm.Array: _array_from_text,
+    jvm.Reference: _ref_from_text,
+    jvm.Object: _ref_from_text,
+}
+
 def converStringToJvmValue(text: str, param_type, state):
     if text == "null":
         return jvm.Value(jvm.Reference(param_type), None)
-    
-    #for bools
-    if isinstance(param_type, jvm.Boolean): 
-        return jvm.Value.int(1 if text.lower() == "true" else 0)
-    
-    #for ints (dont have handling for doubles and longs because they take up two spaces on stack and dont have any byte cases)
-    if isinstance(param_type, jvm.Int):
-        return jvm.Value.int(int(text))
-    
-    #for floats
-    if isinstance(param_type, jvm.Float):
-        if text == "NaN":
-            val = float("nan")
-        elif text == "Infinity":
-            val = float("inf")
-        elif text == "- Infinity":
-            val = float("-inf")
-        else:
-            val = float(text)
-        return jvm.Value.float(val)
 
-    #dont have any tests for char, doubles, longs, and bytes so i am not making the conversion
-    
-    #for arrays
-    if isinstance(param_type, jvm.Array):
-        inner_type = param_type.contains
-        raw = text.strip()[1:-1]
-        elems_str = [e.strip() for e in raw.split(",")] if raw else []
-
-        heapArr = []
-        for e in elems_str:
-            val = converStringToJvmValue(e, inner_type, state)
-            heapArr.append(val)
-        addr = len(state.heap)
-        state.heap[addr] = heapArr
-        return jvm.Value(jvm.Reference(param_type), addr)
-    
-    if isinstance(param_type, (jvm.Reference, jvm.Object)):
-        return jvm.Value(jvm.Reference(param_type), None)
+    convert = _FROM_TEXT.get(type(param_type))
+    if convert is not None:
+        return convert(text, param_type, state)
     try:
         return jvm.Value.int(int(text))
     except Exception:
@@ -79,30 +111,48 @@ def inputValues(methodid, tuple_of_strings):
     frame = Frame.from_method(methodid)
     state = State({}, Stack.empty().push(frame))
 
+    params = methodid.extension.params
     values =[]
     for idx, text in enumerate(tuple_of_strings):
-        param_type = methodid.extension.params[idx]
+        param_type = params[idx]
         v = converStringToJvmValue(text, param_type, state)
         values.append(v)
     return values, state
 
 # GENERATE VALUES: INT, BOOLEAN, FLOATS, ARRAYS:
-def gen_value(param_type, state):
-    if isinstance(param_type, jvm.Array):
-        comp = param_type.component_type
-        length = random.randint(1,5)
-
-        elems = [gen_value(comp, state) for _ in range(length)]
-        addr = len(state.heap)
-        state.heap[addr] = elems
-        return jvm.Value(jvm.Reference(param_type), addr)
-    
-    if isinstance(param_type, jvm.Int) or param_type == "I":
-        return random.randint(-10, 10)
-    elif isinstance(param_type, jvm.Boolean) or param_type == "Z":
-        return random.choice([True, False])
-    elif isinstance(param_type, jvm.Float) or param_type == "F":
-        return random.uniform(-10.0, 10.0)  # generates a float
+def _gen_array(param_type, state, rng):
+    comp = param_type.component_type
+    length = rng.randint(1,5)
+
+    elems = [gen_value(comp, state, rng) for _ in range(length)]
+    addr = _heap_alloc(state, elems)
+    return jvm.Value(jvm.Reference(param_type), addr)
+
+def _gen_int(param_type, state, rng):
+    return rng.randint(-10, 10)
+
+def _gen_bool(param_type, state, rng):
+    return rng.choice([True, False])
+
+def _gen_float(param_type, state, rng):
+    return rng.uniform(-10.0, 10.0)  # generates a float
+
+def _gen_ref(param_type, state, rng):
+    return jvm.Value(jvm.Reference(), None)
+
+# generator for each parameter type, or its descriptor
+_GEN = {
+    jvm.Array: _gen_array,
+    jvm.Int: _gen_int, "I": _gen_int,
+    jvm.Boolean: _gen_bool, "Z": _gen_bool,
+    jvm.Float: _gen_float, "F": _gen_float,
+    jvm.Reference: _gen_ref,
+}
+
+def gen_value(param_type, state, rng=random):
+    gen = _GEN.get(type(param_type)) or _GEN.get(param_type)
+    if gen is not None:
+        return gen(param_type, state, rng)
     # elif isinstance(param_type, jvm.Array) or param_type == "array":
     #     length = random.randint(0, 5)
 # this isnt generic this is a hard coded example    
@@ -112,8 +162,6 @@ def gen_value(param_type, state):
     #     addr = len(state.heap)
     #     state.heap[addr] = heap_arr
         #return jvm.Value(jvm.Reference(jvm.Array(jvm.Char())), addr)
-    elif isinstance(param_type, jvm.Reference):
-        return jvm.Value(jvm.Reference(), None)
     
     return jvm.Value.int( 0)
     #     return [random.randint(-10, 10) for _ in range(length)]
@@ -126,35 +174,67 @@ def gen_value(param_type, state):
 
 
 
+# A run whose top frame keeps the same pc and stack depth for this many steps
+# in a row is stuck, and is stopped before its step budget runs out
+STALL_STEPS = 16
+
+# Returns the updated (last progress, steps without progress) pair after a step
+def _track_stall(state, last, same):
+    frame = state.frames.peek()
+    cur = (frame.pc.offset, len(frame.stack.items))
+    if cur == last:
+        return last, same + 1
+    return cur, 0
+
+
+# One random trial, run in a worker process: True if the run divides by zero
+def _run_one_trial(methodid, seed):
+    rng = random.Random(seed)  # own generator, so workers don't share RNG state
+
+    # Create frame and state first, array inputs are allocated on its heap
+    frame = Frame.from_method(methodid)
+    state = State({}, Stack.empty().push(frame))
+    input_values = [gen_value(param, state, rng) for param in methodid.extension.params]
+
+    # Fill locals
+    for i, v in enumerate(input_values):
+        if isinstance(v, bool):
+            frame.locals[i] = jvm.Value.int(1 if v else 0)
+        elif isinstance(v, float):
+            frame.locals[i] = jvm.Value.float(v)
+        elif isinstance(v, jvm.Array):
+            # Example: store array as a reference, depending on JVM representation
+            frame.locals[i] = jvm.Value.array(v) # check because this 
+        else:
+            frame.locals[i] = jvm.Value.int(v)
+
+    # Run interpreter
+    last, same = None, 0
+    for _ in range(1000):
+        state = step(state)
+        if not isinstance(state, State):  # finished: an error string or the return value
+            return state == "divide by zero"
+        last, same = _track_stall(state, last, same)
+        if same >= STALL_STEPS:
+            break
+    return False
+
+
 # FUNCTION IF YOU WANT TO USE RANDOM INPUTS ONLY:
 def run_random_dynamic_analysis(methodid, num_trials=100):
     found_query_behavior = False
 
-    for _ in range(num_trials):
-        input_values = [gen_value(param) for param in methodid.extension.params]
-    
-        # Create frame and pre-fill locals
-        frame = Frame.from_method(methodid)
-
-        # Fill locals
-        for i, v in enumerate(input_values):
-            if isinstance(v, bool):
-                frame.locals[i] = jvm.Value.int(1 if v else 0)
-            elif isinstance(v, float):
-                frame.locals[i] = jvm.Value.float(v)
-            elif isinstance(v, jvm.Array):
-                # Example: store array as a reference, depending on JVM representation
-                frame.locals[i] = jvm.Value.array(v) # check because this 
-            else:
-                frame.locals[i] = jvm.Value.int(v)
-
-        # Run interpreter
-        state = State({}, Stack.empty().push(frame))
-        for _ in range(1000):
-            state = step(state)
-            if isinstance(state, str) and state == "divide by zero":
+    # The trials are independent, so they run in parallel, one seed each
+    seeds = [random.randrange(2**32) for _ in range(num_trials)]
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+        futures = [pool.submit(_run_one_trial, methodid, seed) for seed in seeds]
+        for future in as_completed(futures):
+            if future.result():
                 found_query_behavior = True
                 print("divide by zero")
+                # no need to run the remaining trials
+                for f in futures:
+                    f.cancel()
                 break
 
     print("Params for", methodid.extension.name, ":", methodid.extension.params)
@@ -199,12 +279,13 @@ def gen_int(depth):
 def run_smallcheck_dynamic_analysis(methodid, num_trials=100):
     found_query_behavior = False
     int_gen = gen_int(20)  # generator
+    params = methodid.extension.params
 
     for _ in range(num_trials):
         input_values = []
 
         try:
-            for param_type in methodid.extension.params:
+            for param_type in params:
                 if isinstance(param_type, jvm.Int) or param_type == "I":
                     # may raise StopIteration when exhausted
                     input_values.append(next(int_gen))
@@ -230,6 +311,7 @@ def run_smallcheck_dynamic_analysis(methodid, num_trials=100):
 
         # Run interpreter
         state = State({}, Stack.empty().push(frame))
+        last, same = None, 0
         for _ in range(1000):
             state = step(state)
             if isinstance(state, str):
@@ -237,9 +319,14 @@ def run_smallcheck_dynamic_analysis(methodid, num_trials=100):
                     found_query_behavior = True
                     print("divide by zero")
                 break
+            if not isinstance(state, State):  # returned a value
+                break
+            last, same = _track_stall(state, last, same)
+            if same >= STALL_STEPS:
+                break
 
     # Print results
-    print("Params for", methodid.extension.name, ":", methodid.extension.params)
+    print("Params for", methodid.extension.name, ":", params)
     print(f"{methodid.extension.name}: 100%" if found_query_behavior else f"{methodid.extension.name}: 50%")
 
     return state
@@ -247,28 +334,47 @@ def run_smallcheck_dynamic_analysis(methodid, num_trials=100):
 
 
 
+# element constructor for each array component type
+_ELEM_CTORS = {
+    jvm.Char: jvm.Value.char,
+    jvm.Int: jvm.Value.int,
+    jvm.Boolean: jvm.Value.boolean,
+    jvm.Float: lambda elem: jvm.Value(jvm.Float(), float(elem)),
+}
+
 def makeJvmArray(rawArray, componentType, state):
-    heapArr = []
-        #iterable = list(rawArray) if isinstance(rawArray, str) else rawArray
-    for elem in rawArray:
-        if isinstance(componentType, jvm.Char):
-            heapArr.append(jvm.Value.char(elem))
-        elif isinstance(componentType, jvm.Int):
-            heapArr.append(jvm.Value.int(elem))
-        elif isinstance(componentType, jvm.Boolean):
-            heapArr.append(jvm.Value.boolean(elem))
-        elif isinstance(componentType, jvm.Float):
-            heapArr.append(jvm.Value(jvm.Float(), float(elem)))
-        else:    
+    # the component type is the same for every element, so pick the constructor once
+    ctor = _ELEM_CTORS.get(type(componentType))
+    if ctor is None:
+        def ctor(elem):  # only an error once there is an element to build
             raise NotImplementedError(f"Component type {componentType} not supported ")
-    addr = len(state.heap)
-    state.heap[addr] =heapArr
+        #iterable = list(rawArray) if isinstance(rawArray, str) else rawArray
+    heapArr = [ctor(elem) for elem in rawArray]
+    addr = _heap_alloc(state, heapArr)
         #checking if the loading of arrays from the dynamic_analyzer is the problem
     #print("DEBUGGING Heap keys:", list(state.heap.keys()), "addr:", addr, "heapArr:", heapArr)
     return jvm.Value(jvm.Reference(jvm.Array(componentType)), addr)
 
 
 
+# Bytecode offsets of a method, read from the decompiled class once per method
+@lru_cache(maxsize=512)
+def _method_offsets(methodid) -> frozenset[int]:
+    return frozenset(instr.offset for instr in jpamb.Suite().method_opcodes(methodid))
+
+
+# New offsets seen before the coverage-guided loop asks the generator for more inputs
+NEW_OFFSETS_PER_REQUEST = 4
+
+# call the generator for more inputs and add to queue
+def _request_seeds(input_gen, method_str, seeds_queue):
+    try:
+        seeds_queue.extend(input_gen.generate_inputs([method_str], 4).get(method_str, []))
+    except Exception:
+        # ignore failures in generator during fuzzing
+        pass
+
+
 # FUNCTION FOR IF YOU WANT TO GET THE COVERAGE:
 def run_coverage_guided_analysis(methodid, num_trials=3):
     input_gen = CombinedInputGenerator()
@@ -282,7 +388,7 @@ def run_coverage_guided_analysis(methodid, num_trials=3):
 
     # interesting = [b""]
     coverage_seen = set()
-    seeds_queue = []
+    seeds_queue = deque()
 
     try: 
         batch = input_gen.generate_inputs([method_str], 10).get(method_str, [])
@@ -299,7 +405,7 @@ def run_coverage_guided_analysis(methodid, num_trials=3):
 
     trials = 0
     while trials < num_trials and seeds_queue:
-        i = seeds_queue.pop(0)
+        i = seeds_queue.popleft()
         trials += 1
 
         # Convert strings -> jvm.Value and create state/frame
@@ -318,6 +424,8 @@ def run_coverage_guided_analysis(methodid, num_trials=3):
 
         # Run the interpreter and collect coverage
         local_coverage = set()
+        last, same = None, 0
+        pending_new = 0  # new offsets not yet answered with more inputs
         for _ in range(2000):
             state = step(state)
 
@@ -331,15 +439,12 @@ def run_coverage_guided_analysis(methodid, num_trials=3):
             if pc_offset not in coverage_seen:
                 # new offset discovered
                 coverage_seen.add(pc_offset)
-                # When new coverage is discovered we request more inputs:
-                # call the generator for more inputs and add to queue
-                try:
-                    more = input_gen.generate_inputs([method_str], 4).get(method_str, [])
-                    for m in more:
-                        seeds_queue.append(m)
-                except Exception:
-                    # ignore failures in generator during fuzzing
-                    pass
+                # When new coverage is discovered we request more inputs,
+                # once for every NEW_OFFSETS_PER_REQUEST new offsets
+                pending_new += 1
+                if pending_new >= NEW_OFFSETS_PER_REQUEST:
+                    _request_seeds(input_gen, method_str, seeds_queue)
+                    pending_new = 0
 
             local_coverage.add(pc_offset)
 
@@ -348,6 +453,12 @@ def run_coverage_guided_analysis(methodid, num_trials=3):
 
             if not isinstance(state, State):
                 break
+            last, same = _track_stall(state, last, same)
+            if same >= STALL_STEPS:
+                break
+
+        if pending_new:
+            _request_seeds(input_gen, method_str, seeds_queue)
 
         # If we didn't get any coverage from this seed, optionally mutate and requeue
         if not local_coverage:
@@ -359,13 +470,13 @@ def run_coverage_guided_analysis(methodid, num_trials=3):
             except Exception:
                 pass
             
-    all_ops = set(jpamb.Suite().method_opcodes(methodid))
-    
-    all_offsets = {instr.offset for instr in all_ops}
+    all_offsets = _method_offsets(methodid)
+    if not all_offsets:
+        return 100.0  # nothing to cover
 
     #print(f"{methodid.extension.name} coverage-guided: {len(coverage_seen)} offsets seen, paths: {coverage_seen} out of {all_offsets}")
     
-    return len(all_offsets.intersection(coverage_seen)) / len(all_offsets) * 100
+    return len(all_offsets & coverage_seen) / len(all_offsets) * 100
 
 
 
@@ -1,4 +1,6 @@
-from typing import Any, Dict
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator
 from jpamb.jvm.base import AbsMethodID
 import re
 import os
@@ -6,6 +8,13 @@ import tree_sitter
 import tree_sitter_java
 from jpamb import jvm
 
+@lru_cache(maxsize=256)
+def _class_decl_re(class_name: str) -> re.Pattern:
+    """
+    The pattern matching the declaration of class_name, compiled once per name.
+    """
+    return re.compile(rf"(\b(?:public\s+)?(?:final\s+)?class\s+){re.escape(class_name)}\b")
+
 def rename_java_class(source: str, old_name: str, new_name: str) -> str:
     """
     Rename the class declaration from old_name to new_name.
@@ -14,197 +23,257 @@ def rename_java_class(source: str, old_name: str, new_name: str) -> str:
         public final class Bloated {
         class Bloated {
     """
-    pattern = re.compile(rf"(\b(?:public\s+)?(?:final\s+)?class\s+){old_name}\b")
-    return pattern.sub(rf"\1{new_name}", source, count=1)
+    return _class_decl_re(old_name).sub(rf"\1{new_name}", source, count=1)
 
 ## ARGS ##
 
-def _remove_arg_from_signature(source: str, method_name: str, arg_index: int) -> str:
+@lru_cache(maxsize=256)
+def _signatures_re(method_names: tuple[str, ...]) -> re.Pattern:
     """
-    Remove the arg_index-th parameter from the given method's signature.
-    Only handles patterns like 'public static <ret> method(...)'.
+    The pattern matching 'public static' signatures of any of method_names,
+    compiled once per set of names.
     """
-    pattern = re.compile(
-        rf"(public\s+static\s+[^\s]+\s+{re.escape(method_name)}\s*)\(([^)]*)\)",
+    names = "|".join(re.escape(name) for name in method_names)
+    return re.compile(
+        rf"(public\s+static\s+[^\s]+\s+({names})\s*)\(([^)]*)\)",
         re.MULTILINE,
     )
 
+def _remove_args_from_signatures(source: str, removals: Dict[str, list[int]]) -> str:
+    """
+    Remove the given parameter indices from each method's signature, for all
+    methods in a single scan of the source.
+    Only handles patterns like 'public static <ret> method(...)', and only the
+    first signature of each method is rewritten.
+    """
+    pattern = _signatures_re(tuple(sorted(removals)))
+    done: set[str] = set()
+
     def replacer(m: re.Match) -> str:
+        method_name = m.group(2)
+        if method_name in done:
+            return m.group(0)
+        done.add(method_name)
+
         prefix = m.group(1)
-        params_str = m.group(2).strip()
+        params_str = m.group(3).strip()
         if not params_str:
             return m.group(0)  # no params
 
+        # indices out of range are left as is
+        drop = removals[method_name]
         params = [p.strip() for p in params_str.split(",") if p.strip()]
-        if arg_index >= len(params):
-            # index out of range -> leave as is
-            return m.group(0)
-
-        new_params = [p for i, p in enumerate(params) if i != arg_index]
+        new_params = [p for i, p in enumerate(params) if i not in drop]
         new_params_str = ", ".join(new_params)
         return f"{prefix}({new_params_str})"
 
-    return pattern.sub(replacer, source, count=1)
+    return pattern.sub(replacer, source)
 
 import tree_sitter
 import tree_sitter_java
 
-def _remove_nth_arg_from_calls(source_code: str, method_name: str, arg_index: int) -> str:
+@lru_cache(maxsize=None)
+def _java_language() -> tree_sitter.Language:
+    return tree_sitter.Language(tree_sitter_java.language())
+
+@lru_cache(maxsize=None)
+def _java_parser() -> tree_sitter.Parser:
     """
-    Remove the arg_index-th argument (0-based) from all calls to `method_name`
-    in this Java source file.
+    The Java parser, created on first use and shared by every parse.
     """
-    java_lang = tree_sitter.Language(tree_sitter_java.language())
-    parser = tree_sitter.Parser(java_lang)
-    source_bytes = source_code.encode("utf-8")
-    tree = parser.parse(source_bytes)
-    root = tree.root_node
+    return tree_sitter.Parser(_java_language())
+
+@lru_cache(maxsize=None)
+def _java_query(source: str) -> tree_sitter.Query:
+    """
+    A tree-sitter query over Java, compiled on first use.
+    """
+    return tree_sitter.Query(_java_language(), source)
 
-    edits: list[tuple[int, int, bytes]] = []  # (start_byte, end_byte, replacement_bytes)
+# Calls with their name and argument list
+_CALLS_QUERY = "(method_invocation name: (identifier) @name arguments: (argument_list) @args)"
 
-    stack = [root]
-    while stack:
-        node = stack.pop()
-        stack.extend(reversed(node.children))
+# Method declarations with their name
+_METHODS_QUERY = "(method_declaration name: (identifier) @name) @method"
 
-        if node.type != "method_invocation":
-            continue
+def _remove_args_from_calls(source_code: str, removals: Dict[str, list[int]]) -> str:
+    """
+    Remove the given argument indices (0-based) from all calls to each method
+    in `removals`, with a single parse of this Java source file.
+    """
+    source_bytes = source_code.encode("utf-8")
+    tree = _java_parser().parse(source_bytes)
+    root = tree.root_node
 
-        name_node = node.child_by_field_name("name")
-        if not name_node or not name_node.text:
-            continue
-        mname = name_node.text.decode()
-        if mname != method_name:
-            continue
+    # (start_byte, end_byte, kept argument spans) of the text between ( and )
+    edits: list[tuple[int, int, list[tuple[int, int]]]] = []
 
-        args_node = node.child_by_field_name("arguments")
-        if not args_node:
+    for _, captures in tree_sitter.QueryCursor(_java_query(_CALLS_QUERY)).matches(root):
+        name_node = captures["name"][0]
+        if not name_node.text:
+            continue
+        drop = removals.get(name_node.text.decode())
+        if drop is None:
             continue
 
+        args_node = captures["args"][0]
         arg_exprs = list(args_node.named_children)
-        if arg_index >= len(arg_exprs):
+        if not any(i < len(arg_exprs) for i in drop):
             continue
 
-        # Build new argument text
-        kept_parts: list[bytes] = []
-        for i, arg_node in enumerate(arg_exprs):
-            if i == arg_index:
-                continue
-            part = source_bytes[arg_node.start_byte:arg_node.end_byte]
-            kept_parts.append(part)
-
-        new_args_bytes = b", ".join(kept_parts)
+        kept = [
+            (arg_node.start_byte, arg_node.end_byte)
+            for i, arg_node in enumerate(arg_exprs)
+            if i not in drop
+        ]
 
         # replace only the inside between ( and )
         inner_start = args_node.start_byte + 1    # after '('
         inner_end = args_node.end_byte - 1    # before ')'
 
-        edits.append((inner_start, inner_end, new_args_bytes))
+        edits.append((inner_start, inner_end, kept))
 
     if not edits:
         return source_code
 
-    # Apply edits from left to right
+    # Apply edits from left to right. A call nested in a kept argument of
+    # another edited call is rewritten as part of that argument's text.
     edits.sort(key=lambda e: e[0])
-
-    out = bytearray()
-    pos = 0
-    for start, end, repl in edits:
-        out += source_bytes[pos:start]
-        out += repl
-        pos = end
-    out += source_bytes[pos:]
-
-    return out.decode("utf-8")
+    starts = [e[0] for e in edits]
+
+    def rewrite(start: int, end: int) -> bytes:
+        out = bytearray()
+        pos = start
+        for k in range(bisect_left(starts, start), len(edits)):
+            e_start, e_end, kept = edits[k]
+            if e_start >= end:
+                break
+            if e_start < pos or e_end > end:
+                continue    # nested in an edit already applied, or the enclosing edit itself
+            out += source_bytes[pos:e_start]
+            out += b", ".join(rewrite(a, b) for a, b in kept)
+            pos = e_end
+        out += source_bytes[pos:end]
+        return bytes(out)
+
+    return rewrite(0, len(source_bytes)).decode("utf-8")
 
 
 def remove_args_from_methods(source: str, spec: Dict[str, Any]) -> str:
     """
     Given Java source and a spec remove parameters at the given indices from each method's signature.
     """
+    removals: Dict[str, list[int]] = {}
     for method_name, data in spec.items():
         arg_indices = sorted(set(data.get("args", [])), reverse=True)
-        if not arg_indices:
-            continue
+        if arg_indices:
+            removals[method_name] = arg_indices
+    if not removals:
+        return source
+
+    # 1) remove from all method signatures at once
+    source = _remove_args_from_signatures(source, removals)
 
-        for idx in arg_indices:
-            # 1) remove from method signature
-            source = _remove_arg_from_signature(source, method_name, idx)
-            # 2) remove from all call sites
-            source = _remove_nth_arg_from_calls(source, method_name, idx)
+    # 2) remove from all call sites at once
+    source = _remove_args_from_calls(source, removals)
 
     return source
 
+def _line_starts(source: str) -> list[int]:
+    """
+    Offsets of the first character of every line in source.
+    """
+    starts = [0]
+    i = source.find("\n")
+    while i != -1:
+        starts.append(i + 1)
+        i = source.find("\n", i + 1)
+    return starts
+
 class Debloat:    
+    _ensured_dirs: set[str] = set()     # output folders already created in this process
+
     def __init__(self, source_code: str):
-        self.lines_to_be_deleted = {}       # {AbsMethodID: [lists of line numbers]}
+        self.lines_to_be_deleted: dict[AbsMethodID, list[int]] = {}       # {AbsMethodID: [line numbers]}
         self.source_code = source_code
+        self.line_starts = _line_starts(source_code)   # offset of each line, computed once
+        # a trailing newline ends the last line rather than starting a new one
+        self.line_count = len(self.line_starts) - (not source_code or source_code.endswith("\n"))
+        self._tree: tree_sitter.Tree | None = None  # parse of _tree_source, see _get_tree
+        self._tree_source: str | None = None
     
     def register_deletions(self, method_id: AbsMethodID, lines: list[int]):
         """
         Store deletion-line candidates for a method.
         These are NOT yet applied — this only records them.
         """
-        if method_id not in self.lines_to_be_deleted.keys():
-            self.lines_to_be_deleted[method_id] = []
-            self.lines_to_be_deleted[method_id].append(list(lines))
-        else:
-            self.lines_to_be_deleted[method_id].append(list(lines))
-
-    def sort_lines_desc(self, method_id: AbsMethodID) -> list[int]:
-        """
-        Sorts line numbers in descending order so they can be safely deleted
-        (bottom-up deletion avoids index shifting issues).
-
-        Returns:
-            list[int]: sorted list (highest line first)
-        """
-        if method_id not in self.lines_to_be_deleted:
-            return []
-
-        blocks = self.lines_to_be_deleted[method_id]
-
-        blocks = [sorted(block) for block in blocks] # sort each block's lines ascending
-
-        blocks.sort(key=lambda b: b[0] if b else -1, reverse=True) # sort blocks by first line descending
+        self.lines_to_be_deleted.setdefault(method_id, []).extend(lines)
 
-        self.lines_to_be_deleted[method_id] = blocks
-
-    def debloat_source(self, delete_lines: list[int]) -> str:
+    def debloat_source(self, delete_lines: Iterable[int]) -> str:
         """
         Deletes the specified line numbers from the source code
         and records them in self.lines_to_be_deleted[method_id].
         """
-        delete_set = set(delete_lines)
-
-        out_lines = []
-
-        for i, line in enumerate(self.source_code.splitlines(), start=1):
-            if i not in delete_set:
-                out_lines.append(line)
+        return "\n".join(self._kept_runs(delete_lines))
 
-        clean_code = "\n".join(out_lines)
-
-        return clean_code
+    def _kept_runs(self, delete_lines: Iterable[int]) -> Iterator[str]:
+        """
+        Yields the runs of kept lines between consecutive deleted lines, each
+        as one slice of the source without its final newline.
+        """
+        source = self.source_code
+        starts = self.line_starts
+        n = self.line_count
+        if not isinstance(delete_lines, (set, frozenset)):
+            delete_lines = frozenset(delete_lines)
+
+        first = 1  # first line of the current run
+        for ln in sorted(delete_lines):
+            if ln < 1:
+                continue
+            if ln > n:
+                break
+            if first < ln:
+                yield source[starts[first - 1]:starts[ln - 1] - 1]
+            first = ln + 1
+        if first <= n:
+            yield source[starts[first - 1]:len(source) - source.endswith("\n")]
 
     def compress_blank_lines(self, code: str) -> str:
         """
         Replace multiple blank lines with a single blank line.
         """
-        return re.sub(r"\n\s*\n+", "\n\n", code)
+        lines = code.split("\n")
+        last = len(lines) - 1
+        out_lines = [lines[0]]
+        blank = False   # inside a run of blank lines already written as one
+        # The first and last line have no line break on one side and are kept as is
+        for line in lines[1:last]:
+            if not line or line.isspace():
+                if not blank:
+                    out_lines.append("")
+                    blank = True
+            else:
+                out_lines.append(line)
+                blank = False
+        if last:
+            out_lines.append(lines[last])
+        return "\n".join(out_lines)
 
     def write_debloated_file(self, folder_path: str, class_name: str, debloated_text: str, iteration: int) -> str:
         """
         Writes the debloated Java source to a new file inside folder_path.
         """
-        if not os.path.exists(folder_path):
+        if folder_path not in Debloat._ensured_dirs:
             os.makedirs(folder_path, exist_ok=True)
+            Debloat._ensured_dirs.add(folder_path)
 
         new_filename = f"{class_name}Debloated.java"
         output_path = os.path.join(folder_path, new_filename)
 
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(debloated_text)
+        # encode once and write the bytes, skipping the text I/O layer
+        with open(output_path, "wb") as f:
+            f.write(debloated_text.encode("utf-8"))
 
         return str(output_path)
     
@@ -215,10 +284,8 @@ class Debloat:
         if method_id not in self.lines_to_be_deleted:
             raise ValueError(f"No deletion lines registered for {method_id}")
         
-        self.sort_lines_desc(method_id) # sort lines for safe deletion
-        blocks = self.lines_to_be_deleted[method_id] # get lines to delete
-        sum_blocks = sum(blocks, []) # flatten list of lists
-        new_source = self.debloat_source(sum_blocks) # debloat source
+        lines = self.lines_to_be_deleted[method_id] # debloat_source orders them itself
+        new_source = self.debloat_source(lines) # debloat source
         self.write_debloated_file(folder_path, class_name, new_source, iteration) # write debloated file
         
         
@@ -255,7 +322,7 @@ class Debloat:
             all_lines_to_delete.update(unused_method_lines)
 
         # 2) Delete those lines from the source once (line numbers refer to original file)
-        debloated = self.debloat_source(sorted(all_lines_to_delete))
+        debloated = self.debloat_source(all_lines_to_delete)
 
         # 3) Remove unused arguments from method signatures based on spec["..."]["args"]
         debloated = remove_args_from_methods(debloated, spec)
@@ -273,6 +340,15 @@ class Debloat:
         output_path = self.write_debloated_file(folder_path, class_name, debloated, iteration)
         return output_path
     
+    def _get_tree(self) -> tree_sitter.Tree:
+        """
+        The parse tree of self.source_code, reparsed only if the source has changed.
+        """
+        if self._tree is None or self._tree_source != self.source_code:
+            self._tree = _java_parser().parse(self.source_code.encode("utf-8"))
+            self._tree_source = self.source_code
+        return self._tree
+
     def remove_methods_by_name(self, method_names: list[str]) -> str:
         # 1) Parse Java source        
         m_names = list()
@@ -281,26 +357,17 @@ class Debloat:
             m_id = jvm.AbsMethodID.decode(m)
             m_names.append(m_id.extension.name)
         
-        java_lang = tree_sitter.Language(tree_sitter_java.language())
-        parser = tree_sitter.Parser(java_lang)
-        tree = parser.parse(self.source_code.encode("utf-8"))
-        root = tree.root_node
+        root = self._get_tree().root_node
 
         target = set(m_names)
         lines_to_delete: set[int] = set()
 
-        # 2) Walk the tree and find method_declaration nodes
-        stack = [root]
-        while stack:
-            node = stack.pop()
-            # Push children for DFS
-            stack.extend(reversed(node.children))
-
-            if node.type != "method_declaration":
-                continue
+        # 2) Find the method_declaration nodes
+        for _, captures in tree_sitter.QueryCursor(_java_query(_METHODS_QUERY)).matches(root):
+            node = captures["method"][0]
 
             # 3) Get the method name
-            name_node = node.child_by_field_name("name")
+            name_node = captures["name"][0]
             print(f"FOUND: {name_node.text}")
             
             if not name_node or not name_node.text:
@@ -1,14 +1,16 @@
-from dataclasses import dataclass
+from collections import deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+import operator
 import sys
-from typing import List, Dict, Literal, Self, Tuple, Optional, Iterable, Union, Any, FrozenSet
-from copy import deepcopy
+from typing import Callable, List, Dict, Literal, Self, Tuple, Optional, Iterable, Union, Any, FrozenSet
 from debloater.static.abstractions.interval_abstraction import Interval
 from jpamb import jvm
 import jpamb
 from loguru import logger
 import json
 
-from debloater.interpreter import PC, Bytecode, Stack, State
+from debloater.interpreter import PC, Bytecode, State
 from debloater.static.abstractions.sign_abstraction import SignSet, holds
 from debloater.static.utils.json_utils import dead_indices_to_lines_in_class
 
@@ -21,6 +23,15 @@ logger.add(sys.stderr, format="[{level}] {message}", level="DEBUG")
 
 CmpRel = Literal[-1, 0, 1]
 
+@lru_cache(maxsize=None)
+def make_name(location: str, index: Any) -> str:
+    """
+    Constraint names are rebuilt on every visit of an instruction, so hand out
+    one interned string per (location, index): dict lookups on the constraints
+    then hit the identity fast path and reuse the cached hash.
+    """
+    return sys.intern(f"{location}_{index}")
+
 @dataclass(frozen=True)
 class FloatCmpResult:
     left_name: str
@@ -28,10 +39,10 @@ class FloatCmpResult:
     possible_rels: FrozenSet[CmpRel]
     onnan: int
 
-@dataclass
+@dataclass(slots=True)
 class PerVarFrame[AV]:
     locals: Dict[int, str]
-    stack: Stack[str]
+    stack: list[str]
     pc: PC
 
     ## Lattice methods (order, meet, join) ##
@@ -39,45 +50,45 @@ class PerVarFrame[AV]:
     def __le__(self, other: "PerVarFrame") -> bool:
         if self.pc != other.pc:
             return False
-        if set(self.locals.keys()) != set(other.locals.keys()):
+        if self.locals.keys() != other.locals.keys():
             return False
         for k in self.locals:
             if not (self.locals[k] <= other.locals[k]):
                 return False
-        h = max(len(self.stack.items), len(other.stack.items))
-        def get(s, i): return s.items[i] if i < len(s.items) else AV.empty()
+        h = max(len(self.stack), len(other.stack))
+        def get(s, i): return s[i] if i < len(s) else AV.empty()
         return all(get(self.stack, i) <= get(other.stack, i) for i in range(h))
 
     def meet(self, other: "PerVarFrame") -> Optional["PerVarFrame"]:
-        if self.pc != other.pc or set(self.locals.keys()) != set(other.locals.keys()):
+        if self.pc != other.pc or self.locals.keys() != other.locals.keys():
             return None
         new_locs = {k: self.locals[k] & other.locals[k] for k in self.locals}
-        h = min(len(self.stack.items), len(other.stack.items))
-        new_stack = Stack([self.stack.items[i] & other.stack.items[i] for i in range(h)])
+        h = min(len(self.stack), len(other.stack))
+        new_stack = [self.stack[i] & other.stack[i] for i in range(h)]
         return PerVarFrame(new_locs, new_stack, self.pc)
 
     def join(self, other: "PerVarFrame") -> Optional["PerVarFrame"]:
-        if self.pc != other.pc or set(self.locals.keys()) != set(other.locals.keys()):
+        if self.pc != other.pc or self.locals.keys() != other.locals.keys():
             return None
         new_locs = dict(self.locals)
         new_locs.update(other.locals)
-        h = max(len(self.stack.items), len(other.stack.items))
-        def get(s, i): return s.items[i] if i < len(s.items) else AV.empty()
-        new_stack = Stack([get(self.stack, i) | get(other.stack, i) for i in range(h)])
+        h = max(len(self.stack), len(other.stack))
+        def get(s, i): return s[i] if i < len(s) else AV.empty()
+        new_stack = [get(self.stack, i) | get(other.stack, i) for i in range(h)]
         return PerVarFrame(new_locs, new_stack, self.pc)
     
     def clone(self) -> "PerVarFrame":
         return PerVarFrame(
             locals=self.locals.copy(),
-            stack=Stack(self.stack.items.copy()),
+            stack=self.stack.copy(),
             pc=self.pc
         )
    
-@dataclass
+@dataclass(slots=True)
 class AState[AV]:
     heap: Dict[int, str]         # abstract heap (addresses -> variable name)
     constraints: Dict[str, any]  # variable constraints (variable name -> abstract value) for both state heap and frame locals
-    frames: Stack[PerVarFrame]   # stack of PerVarFrame
+    frames: list[PerVarFrame]    # call stack, innermost frame last
 
     def __le__(self, other: "AState") -> bool:
         # heap: pointwise <= 
@@ -85,9 +96,9 @@ class AState[AV]:
             if not (self.heap.get(addr, AV.empty()) <= other.heap.get(addr, AV.empty())): # if addr does not exist, treat as empty
                 return False
         # frames: require same number of frames (same call depth) and pointwise <=
-        if len(self.frames.items) != len(other.frames.items):
+        if len(self.frames) != len(other.frames):
             return False
-        for f1, f2 in zip(self.frames.items, other.frames.items):
+        for f1, f2 in zip(self.frames, other.frames):
             if not (f1 <= f2):
                 return False
         return True
@@ -99,15 +110,15 @@ class AState[AV]:
             for addr in set(self.heap) | set(other.heap)
         }
         # frames: require same count and all pairwise meets succeed
-        if len(self.frames.items) != len(other.frames.items):
+        if len(self.frames) != len(other.frames):
             return None
         new_frames = []
-        for f1, f2 in zip(self.frames.items, other.frames.items):
+        for f1, f2 in zip(self.frames, other.frames):
             m = f1.meet(f2)
             if m is None:
                 return None
             new_frames.append(m)
-        return AState(new_heap, Stack(new_frames))
+        return AState(new_heap, new_frames)
 
     def join(self, other: "AState") -> Optional["AState"]:
         # heap join
@@ -117,46 +128,111 @@ class AState[AV]:
         }
         
         # frames: require same count and all pairwise joins succeed
-        if len(self.frames.items) != len(other.frames.items):
+        if len(self.frames) != len(other.frames):
             return None
         new_frames = []
-        for f1, f2 in zip(self.frames.items, other.frames.items):
+        for f1, f2 in zip(self.frames, other.frames):
             j = f1.join(f2)
             if j is None:
                 return None
             new_frames.append(j)
-        return AState(new_heap, Stack(new_frames))
+        return AState(new_heap, new_frames)
     
     
     def clone(self) -> "AState[AV]":
         return AState(
             heap=self.heap.copy(),
-            frames=Stack([f.clone() for f in self.frames.items]),
+            frames=[f.clone() for f in self.frames],
             constraints=self.constraints.copy()
         )
     
     def __ior__(self, other: "AState[AV]") -> Self:
+        self.merge(other)
+        return self
+
+    def subsumed_by(self, other: "AState[AV]") -> bool:
+        """
+        True iff other.merge(self) would leave other unchanged, so the join can be skipped.
+        Mirrors merge: the same names must sit at the same heap addresses, locals and
+        stack slots, and each value of self must already be covered by other's.
+        Conservative: anything merge would rename or add answers False.
+        """
+        c_self, c_other = self.constraints, other.constraints
+
+        def covered(n_other: str, n_self: str) -> bool:
+            if n_other not in c_other:
+                return False
+            v1 = c_other[n_other]
+            v2 = c_self.get(n_self, c_other.get(n_self))
+            if v2 is None:
+                return False
+            if v1 is v2:
+                return True
+            if isinstance(v1, list):
+                return v1 == list(dict.fromkeys(v1 + v2))
+            if isinstance(v1, FloatCmpResult):
+                return v1 == v2
+            return v2 <= v1
+
+        def mapping_covered(dst: Dict[int, str], src: Dict[int, str]) -> bool:
+            return all(dst.get(k) == n and covered(n, n) for k, n in src.items())
+
+        if not mapping_covered(other.heap, self.heap):
+            return False
+        if len(self.frames) != len(other.frames):
+            return False
+        for f_self, f_other in zip(self.frames, other.frames):
+            if f_self.pc != f_other.pc or len(f_self.stack) != len(f_other.stack):
+                return False
+            if not mapping_covered(f_other.locals, f_self.locals):
+                return False
+            if not all(covered(n1, n2) for n1, n2 in zip(f_other.stack, f_self.stack)):
+                return False
+        return True
+
+    def merge(self, other: "AState[AV]", widen: bool = False) -> bool:
+        """
+        Join other into self in place (or widen, when widen is set).
+        Returns True iff self was modified, so callers do not need to compare
+        the joined state against a copy of the old one.
+        """
         c_self = self.constraints
         c_other = other.constraints
+        changed = False
         
         def merge_constraints(n1: str, n2: str) -> AV:
             
             v1 = c_self.get(n1, c_other[n1])
             v2 = c_other.get(n2, c_self[n2])
             
+            # states descend from common clones and abstract values are immutable,
+            # so most names still point at the very same value on both sides
+            if v1 is v2:
+                return v1
             if isinstance(v1, list):
                 return list(dict.fromkeys(v1 + v2))
+            if widen:
+                return v1.widen(v2)
             return v1 | v2
         
+        def update(dst: dict, key, value) -> None:
+            nonlocal changed
+            if key in dst:
+                old = dst[key]
+                if old is value or old == value:
+                    return
+            dst[key] = value
+            changed = True
+        
         def resolve_names(n1: str, n2: str, location: str) -> str:
             if n1 == n2:
-                c_self[n1] = merge_constraints(n1, n2)
+                update(c_self, n1, merge_constraints(n1, n2))
                 return n1
             
             count = sum(n.startswith(location) for n in c_self.keys())
-            new_name = f"{location}_{count}"
+            new_name = make_name(location, count)
             
-            c_self[new_name] = merge_constraints(n1, n2)
+            update(c_self, new_name, merge_constraints(n1, n2))
             return new_name
         
         # dst = self, src = other - modify in place
@@ -165,513 +241,666 @@ class AState[AV]:
                 if n_other.startswith("arg"): location = "arg"
                 if k in dst:
                     # if dst has the same address, merge
-                    dst[k] = resolve_names(dst[k], n_other, location)
+                    update(dst, k, resolve_names(dst[k], n_other, location))
                 else:
                     # else, add the new key to dst and handle constraints
-                    dst[k] = n_other
+                    update(dst, k, n_other)
                     # ensure the name's value exists on self, join constraints if present on both
                     if n_other in c_self and n_other in c_other:
-                        c_self[n_other] = merge_constraints(n_other, n_other)
+                        update(c_self, n_other, merge_constraints(n_other, n_other))
                     elif n_other not in c_self and n_other in c_other:
-                        c_self[n_other] = c_other[n_other]
+                        update(c_self, n_other, c_other[n_other])
                         
         # 1. Heap: pointwise by address
         merge_mapping(self.heap, other.heap, "heap")
         
         # 2. Frames: pointwise by depth
-        for f1, f2 in zip(self.frames.items, other.frames.items, strict=True):
+        for f1, f2 in zip(self.frames, other.frames, strict=True):
             assert f1.pc == f2.pc, f"PC differs: {f1.pc} != {f2.pc}"
 
             # locals: Dict[int, str]
             merge_mapping(f1.locals, f2.locals, "local")
 
             # stack: same height, elementwise names (str)
-            s1, s2 = f1.stack.items, f2.stack.items
+            s1, s2 = f1.stack, f2.stack
             assert len(s1) == len(s2), f"stacks should be of the same size to join"
             for i, (n1, n2) in enumerate(zip(s1, s2)):
                 # merge the constraints of the 2 stacks of value names in place
                 # since equal length is ensured, just marge them pairwise
-                c_self[n1] = merge_constraints(n1, n2)
+                update(c_self, n1, merge_constraints(n1, n2))
 
-        return self
+        return changed
     
 
-@dataclass
+@dataclass(slots=True)
 class StateSet[AV]:
     per_inst : dict[PC, AState[AV]]
-    needswork : set[PC]
+    needswork : deque[PC]           # FIFO worklist, each PC queued at most once
+    in_worklist : set[PC]           # PCs currently queued in needswork
+    joins : dict[PC, int] = field(default_factory=dict)    # number of joins per PC
 
     # While there are PCs that need work, we just pick the next one with its corresponding AState
     def per_instruction(self):
         while self.needswork:
-            pc = self.needswork.pop()
+            pc = self.needswork.popleft()
+            self.in_worklist.discard(pc)
             yield self.per_inst[pc]
 
+    def schedule(self, pc: PC) -> None:
+        if pc not in self.in_worklist:
+            self.in_worklist.add(pc)
+            self.needswork.append(pc)
+
     # sts |= astate
     def __ior__(self, astate: AState[AV]):    
-        pc = astate.frames.peek().pc
+        pc = astate.frames[-1].pc
         old = self.per_inst.get(pc)
 
         if old is None:
             # First time seeing this pc
             self.per_inst[pc] = astate.clone()
-            self.needswork.add(pc)
+            self.schedule(pc)
+            return self
+        
+        # Nothing new: skip the clone and the join altogether
+        if astate.subsumed_by(old):
             return self
         
-        new_state = deepcopy(old)
-        new_state |= astate
+        # Abstract values are immutable, so copying the containers the join
+        # writes into (heap, constraints, locals, stacks) is enough to keep old intact
+        new_state = old.clone()
+        
+        # Widen at loop heads once plain joins had a fair chance to converge,
+        # so domains with infinite ascending chains (intervals) still terminate
+        self.joins[pc] = n = self.joins.get(pc, 0) + 1
+        widen = n > WIDEN_DELAY and pc.offset in loop_heads(pc.method)
         
-        # If the working set is changed after ior, the PC still needs work
+        # If the working set is changed by the join, the PC still needs work
         # Otherwise a fixpoint is reached and we do nothing
-        if new_state != old:
+        if new_state.merge(astate, widen):
             self.per_inst[pc] = new_state
-            self.needswork.add(pc)
+            self.schedule(pc)
 
         return self
 
 _suite = jpamb.Suite()
+bc = Bytecode(_suite, dict())   # decodes each method once, then indexes by pc
+
+WIDEN_DELAY = 10    # joins at a loop head before widening kicks in
+
+
+@lru_cache(maxsize=None)
+def method_pcs(method: jvm.AbsMethodID) -> tuple[PC, ...]:
+    """
+    One PC per offset of the method (plus one past the end), shared by all states,
+    so moving to the next instruction or a jump target is a lookup, not an allocation.
+    """
+    bc[PC(method, 0)]   # make sure the method is decoded
+    return tuple(PC(method, i) for i in range(len(bc.methods[method]) + 1))
+
+def next_pc(pc: PC) -> PC:
+    return method_pcs(pc.method)[pc.offset + 1]
+
+def jump_pc(pc: PC, target: int) -> PC:
+    return method_pcs(pc.method)[target]
+
+
+@lru_cache(maxsize=None)
+def loop_heads(method: jvm.AbsMethodID) -> frozenset[int]:
+    """Offsets targeted by a backward jump, i.e. the heads of the method's loops."""
+    bc[PC(method, 0)]   # make sure the method is decoded
+    heads = set()
+    for i, opr in enumerate(bc.methods[method]):
+        target = getattr(opr, "target", None)
+        if target is not None and target <= i:
+            heads.add(target)
+    return frozenset(heads)
+
+
+# opcodes that end a basic block: control does not simply fall through to the next one
+BLOCK_ENDS = (jvm.Goto, jvm.If, jvm.Ifz, jvm.Return, jvm.Throw, jvm.InvokeStatic)
+
+@lru_cache(maxsize=None)
+def block_leaders(method: jvm.AbsMethodID) -> frozenset[int]:
+    """Offsets that start a basic block: the entry, jump targets and whatever follows a block end."""
+    bc[PC(method, 0)]   # make sure the method is decoded
+    leaders = {0}
+    for i, opr in enumerate(bc.methods[method]):
+        target = getattr(opr, "target", None)
+        if target is not None:
+            leaders.add(target)
+        if isinstance(opr, BLOCK_ENDS):
+            leaders.add(i + 1)
+    return frozenset(leaders)
+
+
+@lru_cache(maxsize=4096)
+def compare(v1, v2, cond: str) -> tuple[bool, ...]:
+    """
+    Memoized v1.compare(v2, cond): the possible outcomes of a branch only depend
+    on the two abstract values and the condition, and the same triples come back
+    on every fixpoint iteration over a loop.
+    Only the outcome set is cached; transfer functions that build new abstract
+    values are not, since equal intervals may still differ in int/float bounds.
+    """
+    return tuple(v1.compare(v2, cond))
+
+# helper to build successor states: only the top frame is replaced, the rest is shared
+# with state, so handlers pass in fresh copies of whatever they modified
+def mk_successor[AV](state: AState[AV], new_frame: PerVarFrame, constraints: dict[str, AV]=None, heap: Dict[int, str]=None) -> AState:
+    frames = state.frames.copy()
+    frames[-1] = new_frame  # replace top frame
+    return AState(
+        heap=state.heap if heap is None else heap,
+        constraints=state.constraints if constraints is None else constraints,
+        frames=frames,
+    )
 
+def float_conditional(state: AState, opr: jvm.Opcode, nf: PerVarFrame, cmp_res: FloatCmpResult, cond):
+    constraints = state.constraints
+    frame = state.frames[-1]
+    
+    l_name = cmp_res.left_name
+    r_name = cmp_res.right_name
+    
+    all_rels = cmp_res.possible_rels
+    
+    val_l = constraints[l_name]
+    val_r = constraints[r_name]
+
+    true_rels = {r for r in all_rels if holds(r, cond)}
+    false_rels = all_rels - true_rels
+
+    # helper: refine 'left_av' for a set of rels by joining constraints
+    def refine_for_rels(rels: set[int]) -> Interval:
+        if not rels:
+            return Interval.empty()
+
+        acc = Interval.empty()
+        for r in rels:
+            if r == -1:
+                op_name = "lt"
+            elif r == 0:
+                op_name = "eq"
+            else:  # 1
+                op_name = "gt"
+
+            t_left, _ = Interval.constrain(val_l, val_r, op_name)
+            
+            acc = acc | t_left
+        return acc
+    
+    targets: list[AState | str] = []
+    
+    # True branch
+    if true_rels:
+        true_frame = nf.clone() if false_rels else nf
+        new_left_true = refine_for_rels(true_rels)
+        
+        const_true = constraints.copy()
+        const_true[l_name] = new_left_true
+        true_frame.pc = jump_pc(frame.pc, opr.target)
+        
+        targets.append(mk_successor(state, new_frame=true_frame, constraints=const_true))
+        
 
-# Step the abstract state (possibly returns more states due to branches)
-def step[AV](state: AState[AV], domain: type[AV]) -> Iterable[AState[AV] | str]:
-    assert isinstance(state, AState), "step expects AState"
-    if not state.frames or not state.frames.items:
-        return []
+    # False branch
+    if false_rels:
+        false_frame = nf
+        new_left_false = refine_for_rels(false_rels)
+        
+        const_false = constraints.copy()
+        const_false[l_name] = new_left_false
+
+        false_frame.pc = next_pc(false_frame.pc)
+        
+        targets.append(mk_successor(state, new_frame=false_frame, constraints=const_false))
+    else: op_hit.remove(opr)
+        
+    return targets
+
+
+def conditional[AV](state: AState[AV], opr: jvm.Opcode, domain: type[AV], nf: PerVarFrame, n1: str, cond, n2: str = None):
+    constraints = state.constraints
+    frame = state.frames[-1]
+    
+    if not n2: v2 = domain.abstract([0])
+    else: v2 = constraints[n2]
     
-    def opcode_at(pc: PC):
-        ops = list(_suite.method_opcodes(pc.method))
-        return ops[pc.offset]
+    v1 = constraints[n1]
+    
+    if isinstance(v1, FloatCmpResult):
+        states = float_conditional(state, opr, nf, v1, cond)
+        return states
+    
+    res = compare(v1, v2, cond)
+    
+    c_true, c_false = domain.constrain(v1, v2, cond)
+        
+    targets: list[AState | str] = []
+    take_true, take_false = True in res, False in res
+        
+    # nf is already a private copy made by the caller, so it only
+    # needs copying again when both branches are feasible
+    if take_true:
+        true_frame = nf.clone() if take_false else nf
+        true_const = constraints.copy()
+        true_const[n1] = c_true
+        true_frame.pc = jump_pc(frame.pc, opr.target)
+        targets.append(mk_successor(state, true_frame, true_const))
+        
+    if take_false:
+        false_frame = nf
+        false_const = constraints.copy()
+        false_const[n1] = c_false
+        false_frame.pc = next_pc(false_frame.pc)
+        targets.append(mk_successor(state, false_frame, false_const))
+    else: op_hit.remove(opr)
+    
+    return targets
+
+
+# Opcode handlers (similar to dynamic interpreter, but on AV).
+# Each one takes (state, frame, opr, domain), where frame is the top frame of state.
 
-    frame = state.frames.peek()
+def step_push(state, frame, opr: jvm.Push, domain):
     constraints = state.constraints
-    pc = frame.pc
-    opr = opcode_at(pc)
-    op_hit.add(opr)
+    val_name = make_name("stack", len(frame.stack))
+    
+    new_const = constraints.copy()
+    new_const[val_name] = domain.abstract([opr.value.value])
+    
+    nf = frame.clone()
+    
+    nf.stack.append(val_name)
+    nf.pc = next_pc(nf.pc)
+    
+    return [mk_successor(state, nf, new_const)]
 
-    # helper to build successor states (deepcopy to isolate)
-    def mk_successor(new_frame: PerVarFrame, constraints: dict[str, AV]=None, heap: Dict[int, str]=None) -> AState:
-        new_state = deepcopy(state)
-        new_state.frames.items[-1] = new_frame  # replace top frame
-        if constraints is not None:
-            new_state.constraints = constraints
-        if heap is not None:
-            new_state.heap = heap
-        return new_state
-    
-    def float_conditional(nf, cmp_res: FloatCmpResult, cond):
-        l_name = cmp_res.left_name
-        r_name = cmp_res.right_name
-        
-        all_rels = cmp_res.possible_rels
-        
-        val_l = constraints[l_name]
-        val_r = constraints[r_name]
-
-        true_rels = {r for r in all_rels if holds(r, cond)}
-        false_rels = all_rels - true_rels
-    
-        # helper: refine 'left_av' for a set of rels by joining constraints
-        def refine_for_rels(rels: set[int]) -> Interval:
-            if not rels:
-                return Interval.empty()
-
-            acc = Interval.empty()
-            for r in rels:
-                if r == -1:
-                    op_name = "lt"
-                elif r == 0:
-                    op_name = "eq"
-                else:  # 1
-                    op_name = "gt"
-
-                t_left, _ = Interval.constrain(val_l, val_r, op_name)
+def step_load(state, frame, opr: jvm.Load, domain):
+    i = opr.index
+    var_name = frame.locals.get(i)
+    
+    nf = frame.clone()
+    
+    nf.stack.append(var_name)
+    
+    if var_name.startswith("local") and i in dead_store.keys():
+        del dead_store[i]
+        
+    if var_name.startswith("arg") and i in dead_arg.keys():
+        del dead_arg[i]
+        
+    nf.pc = next_pc(nf.pc)
+    return [mk_successor(state, nf)]
+
+def step_dup(state, frame, opr: jvm.Dup, domain):
+    new_frame = frame.clone()
+    v = new_frame.stack[-1]
+    new_frame.stack.append(v)
+    new_frame.pc = next_pc(new_frame.pc)
+    return [mk_successor(state, new_frame)]
+
+# binary operators folded on constants; Div keeps going through the domain,
+# which owns the division-by-zero and rounding semantics
+CONCRETE_OPS = {
+    jvm.BinaryOpr.Add: operator.add,
+    jvm.BinaryOpr.Sub: operator.sub,
+    jvm.BinaryOpr.Mul: operator.mul,
+}
+
+def step_binary(state, frame, opr: jvm.Binary, domain):
+    constraints = state.constraints
+    op = opr.operant
+    # pop order preserved: v2 = top, v1 = next
+    nf = frame.clone()
+    
+    n2 = nf.stack.pop()
+    n1 = nf.stack.pop()
+    
+    v1 = constraints[n1]
+    v2 = constraints[n2]
+    
+    c1, c2 = v1.concrete_value(), v2.concrete_value()
                 
-                acc = acc | t_left
-            return acc
-        
-        targets: list[AState | str] = []
-        
-        # True branch
-        if true_rels:
-            true_frame = deepcopy(nf)
-            new_left_true = refine_for_rels(true_rels)
-            
-            const_true = deepcopy(constraints)
-            const_true[l_name] = new_left_true
-            true_frame.pc = PC(frame.pc.method, opr.target)
-            
-            targets.append(mk_successor(new_frame=true_frame, constraints=const_true))
-            
+    if c1 is not None and c2 is not None and op in CONCRETE_OPS:
+        # both operands are known constants: fold instead of abstract arithmetic
+        res = domain.abstract([CONCRETE_OPS[op](c1, c2)])
+    elif op == jvm.BinaryOpr.Add:
+        res = v1.add(v2)
+    elif op == jvm.BinaryOpr.Sub:
+        res = v1.sub(v2)
+    elif op == jvm.BinaryOpr.Mul:
+        res = v1.mul(v2)
+    elif op == jvm.BinaryOpr.Div:
+        res = v1.div(v2)
+    else:
+        # Rem and others: over-approximate -> TOP
+        res = domain.top()
+    res_name = make_name("stack", len(frame.stack))
+    
+    new_const = constraints.copy()
+    new_const[res_name] = res
+    
+    nf.stack.append(res_name)
+    nf.pc = next_pc(nf.pc)
+    
+    return [mk_successor(state, nf, new_const)]
+
+def step_return(state, frame, opr: jvm.Return, domain):
+    t = opr.type
+    frames = state.frames[:-1]
+    if frames:
+        caller = frames[-1].clone()
+        if t:
+            caller.stack.append(frame.stack[-1])
+        caller.pc = next_pc(caller.pc)
+        frames[-1] = caller
+        return [AState(heap=state.heap, constraints=state.constraints, frames=frames)]
+    else:
+        return ["ok"]
+
+def step_get(state, frame, opr: jvm.Get, domain):
+    new_frame = frame.clone()
+    # $assertionsDisabled pushed as 0
+    new_frame.stack.append(domain.abstract([0]))
+    new_frame.pc = next_pc(new_frame.pc)
+    return [mk_successor(state, new_frame)]
+
+def step_ifz(state, frame, opr: jvm.Ifz, domain):
+    # Compare variable on top of the stack to Zero
+    nf = frame.clone()
+    var_name = nf.stack.pop()            
+    targets = conditional(state, opr, domain, nf=nf, n1=var_name, cond=opr.condition)            
+        
+    return targets
+
+def step_new(state, frame, opr: jvm.New, domain):
+    if opr.classname == jvm.ClassName("java/lang/AssertionError"):
+        return ["assertion error"]
+    # otherwise continue
+    new_frame = frame.clone()
+    new_frame.pc = next_pc(new_frame.pc)
+    return [mk_successor(state, new_frame)]
+
+def step_if(state, frame, opr: jvm.If, domain):
+    # two-operand comparison
+    nf = frame.clone()
+    
+    n2 = nf.stack.pop()
+    n1 = nf.stack.pop()
+    
+    return conditional(state, opr, domain, nf=nf, n1=n1, cond=opr.condition, n2=n2)
 
-        # False branch
-        if false_rels:
-            false_frame = deepcopy(nf)
-            new_left_false = refine_for_rels(false_rels)
-            
-            const_false = deepcopy(constraints)
-            const_false[l_name] = new_left_false
+def step_store(state, frame, opr: jvm.Store, domain):
+    constraints = state.constraints
+    i = opr.index
+    nf = frame.clone()
+    v_name = nf.stack.pop()
+    v = constraints[v_name]
+    
+    new_const = constraints.copy()
+    
+    local_name = nf.locals.get(i)
+    
+    if local_name is None:
+        local_name = make_name("local", i)
+        nf.locals[i] = local_name
+    
+    new_const[local_name] = v
+    
+    if not local_name.startswith("arg"):
+        dead_store[i] = opr
+    
+    nf.pc = next_pc(nf.pc)
+    
+    return [mk_successor(state, nf, new_const)]
 
-            false_frame.pc += 1
-            
-            targets.append(mk_successor(new_frame=false_frame, constraints=const_false))
-        else: op_hit.remove(opr)
-            
-        return targets
+def step_goto(state, frame, opr: jvm.Goto, domain):
+    nf = frame.clone()
+    nf.pc = jump_pc(frame.pc, opr.target)
+    return [mk_successor(state, nf)]
 
+def step_incr(state, frame, opr: jvm.Incr, domain):
+    constraints = state.constraints
+    # Load
+    var_name = frame.locals.get(opr.index)
+    v = constraints[var_name]
+    v_i = domain.abstract([opr.amount])
     
-    def conditional(nf, n1: str, cond, n2: str = None):
-        if not n2: v2 = domain.abstract([0])
-        else: v2 = constraints[n2]
-        
-        v1 = constraints[n1]
-        
-        if isinstance(v1, FloatCmpResult):
-            states = float_conditional(nf, v1, cond)
-            return states
-        
-        res = v1.compare(v2, cond)
-        
-        c_true, c_false = domain.constrain(v1, v2, cond)
-            
-        targets: list[AState | str] = []
-            
-        if True in res:
-            true_frame = deepcopy(nf)
-            true_const = deepcopy(constraints)
-            true_const[n1] = c_true
-            true_frame.pc = PC(frame.pc.method, opr.target)
-            targets.append(mk_successor(true_frame, true_const))
-            
-        if False in res:
-            false_frame = deepcopy(nf)
-            false_const = deepcopy(constraints)
-            false_const[n1] = c_false
-            false_frame.pc += 1
-            targets.append(mk_successor(false_frame, false_const))
-        else: op_hit.remove(opr)
-        
-        return targets
+    # Add
+    res = v.add(v_i)
+    
+    # Store
+    const_upd = constraints.copy()
+    const_upd[var_name] = res
+    
+    new_frame = frame.clone()
+    new_frame.pc = next_pc(new_frame.pc)
+    
+    return [mk_successor(state, new_frame=new_frame, constraints=const_upd)]
 
+def step_new_array(state, frame, opr: jvm.NewArray, domain):
+    constraints = state.constraints
+    nf = frame.clone()
+    size_val = nf.stack.pop()
+    size = constraints[size_val]
+    size_conc = size.concrete_value()
+    
+    if size_conc < 0:
+        return "negative size"
+    
+    
+    addr = len(state.heap)
 
-    # handle instructions (similar to dynamic interpreter, but on AV)
-    match opr:
-        case jvm.Push(value=v):
-            val_name = f"stack_{len(frame.stack.items)}"
-            
-            constraints[val_name] = domain.abstract([v.value])
-            
-            nf = deepcopy(frame)
-            
-            nf.stack.push(val_name)
-            nf.pc += 1
-            
-            return [mk_successor(nf, constraints)]
-            
-        case jvm.Load(type=t, index=i):
-            var_name = frame.locals.get(i)
-            
-            nf = deepcopy(frame)
-            
-            nf.stack.push(var_name)
-            
-            if var_name.startswith("local") and i in dead_store.keys():
-                del dead_store[i]
-                
-            if var_name.startswith("arg") and i in dead_arg.keys():
-                del dead_arg[i]
-                
-            nf.pc += 1
-            return [mk_successor(nf)]
-
-        case jvm.Dup():
-            new_frame = deepcopy(frame)
-            v = new_frame.stack.peek()
-            new_frame.stack.push(v)
-            new_frame.pc += 1
-            return [mk_successor(new_frame)]
-
-        case jvm.Binary(type=t, operant=op):
-            # pop order preserved: v2 = top, v1 = next
-            nf = deepcopy(frame)
-            new_const = deepcopy(constraints)
-            
-            n2 = nf.stack.pop()
-            n1 = nf.stack.pop()
-            
-            v1 = constraints[n1]
-            v2 = constraints[n2]
-                        
-            if op == jvm.BinaryOpr.Add:
-                res = v1.add(v2)
-            elif op == jvm.BinaryOpr.Sub:
-                res = v1.sub(v2)
-            elif op == jvm.BinaryOpr.Mul:
-                res = v1.mul(v2)
-            elif op == jvm.BinaryOpr.Div:
-                res = v1.div(v2)
-            else:
-                # Rem and others: over-approximate -> TOP
-                res = domain.top()
-            res_name = f"stack_{len(frame.stack.items)}"
-            
-            new_const = deepcopy(constraints)
-            new_const[res_name] = res
-            
-            nf.stack.push(res_name)
-            nf.pc += 1
-            
-            return [mk_successor(nf, new_const)]
-
-        case jvm.Return(type=t):
-            new_state = deepcopy(state)
-            top_frame = new_state.frames.pop()
-            if t:
-                ret = top_frame.stack.pop()
-            if new_state.frames:
-                caller = new_state.frames.peek()
-                if t:
-                    caller.stack.push(ret)
-                caller.pc += 1
-                return [new_state]
-            else:
-                return ["ok"]
-
-        case jvm.Get(field=field):
-            new_frame = deepcopy(frame)
-            # $assertionsDisabled pushed as 0
-            new_frame.stack.push(domain.abstract([0]))
-            new_frame.pc += 1
-            return [mk_successor(new_frame)]
-
-        case jvm.Ifz():
-            # Compare variable on top of the stack to Zero
-            nf = deepcopy(frame)
-            var_name = nf.stack.pop()            
-            targets = conditional(nf=nf, n1=var_name, cond=opr.condition)            
-                
-            return targets
-
-        case jvm.New(offset, classname):
-            if classname == jvm.ClassName("java/lang/AssertionError"):
-                return ["assertion error"]
-            # otherwise continue
-            new_frame = deepcopy(frame)
-            new_frame.pc += 1
-            return [mk_successor(new_frame)]
-
-        case jvm.If():
-            # two-operand comparison
-            nf = deepcopy(frame)
-            
-            n2 = nf.stack.pop()
-            n1 = nf.stack.pop()
-            
-            return conditional(nf=nf, n1=n1, cond=opr.condition, n2=n2)
-        
-        case jvm.Store(index=i):
-            nf = deepcopy(frame)
-            v_name = nf.stack.pop()
-            v = constraints[v_name]
-            
-            new_const = deepcopy(constraints)
-            
-            local_name = nf.locals.get(i)
-            
-            if local_name is None:
-                local_name = f"local_{i}"
-                nf.locals[i] = local_name
-            
-            new_const[local_name] = v
-            
-            if not local_name.startswith("arg"):
-                dead_store[i] = opr
-            
-            nf.pc += 1
-            
-            return [mk_successor(nf, new_const)]
-        
-        case jvm.Goto(target=t):
-            nf = deepcopy(frame)
-            nf.pc = PC(frame.pc.method, t)
-            return [mk_successor(nf)]
-        
-        case jvm.Incr(index=i, amount=a):
-            # Load
-            var_name = frame.locals.get(i)
-            v = constraints[var_name]
-            v_i = domain.abstract([a])
-            
-            # Add
-            res = v.add(v_i)
-            
-            # Store
-            const_upd = deepcopy(constraints)
-            const_upd[var_name] = res
-            
-            new_frame = deepcopy(frame)
-            new_frame.pc += 1
-            
-            return [mk_successor(new_frame=new_frame, constraints=const_upd)]
-        
-        case jvm.NewArray():
-            nf = deepcopy(frame)
-            size_val = nf.stack.pop()
-            size = constraints[size_val]
-            size_conc = size.concrete_value()
-            
-            if size_conc < 0:
-                return "negative size"
-            
-            
-            addr = len(state.heap)
+    new_const = constraints.copy()
+    new_heap = state.heap.copy()
+    
+    arr_name = make_name("arr", addr)
+    new_heap[addr] = arr_name
+    
+    size_name = make_name(arr_name, "size")
+    new_const[size_name] = size
+    new_const[arr_name] = [addr, size_name]
 
-            new_const = deepcopy(constraints)
-            new_heap = deepcopy(state.heap)
-            
-            arr_name = f"arr_{addr}"
-            new_heap[addr] = arr_name
-            
-            size_name = f"{arr_name}_size"
-            new_const[size_name] = deepcopy(size)
-            new_const[arr_name] = [addr, size_name]
+    nf.stack.append(arr_name)
+    nf.pc = next_pc(nf.pc)
+    
+    return [mk_successor(state, nf, new_const, new_heap)]
 
-            nf.stack.push(arr_name)
-            nf.pc += 1
-            
-            return [mk_successor(nf, new_const, new_heap)]
-        
-        
-        case jvm.ArrayStore():
-            nf = deepcopy(frame)
-            
-            value_name = nf.stack.pop()
-            index_name = nf.stack.pop()
-            arrRe_name = nf.stack.pop()
-            
-            value = constraints[value_name]
-            index = constraints[index_name]
-            arrRef = constraints[arrRe_name]
+def step_array_store(state, frame, opr: jvm.ArrayStore, domain):
+    constraints = state.constraints
+    nf = frame.clone()
+    
+    value_name = nf.stack.pop()
+    index_name = nf.stack.pop()
+    arrRe_name = nf.stack.pop()
+    
+    value = constraints[value_name]
+    index = constraints[index_name]
+    arrRef = constraints[arrRe_name]
 
-            arr = state.heap[arrRef[0]]
-            
-            elem_name = f"{arr}_{index.concrete_value()}"
-            new_const = deepcopy(constraints)
-            new_const[elem_name] = value
+    arr = state.heap[arrRef[0]]
+    
+    elem_name = make_name(arr, index.concrete_value())
+    new_const = constraints.copy()
+    new_const[elem_name] = value
 
-            nf.pc += 1
-            return [mk_successor(new_frame=nf, constraints=new_const)] 
-        
-        
-        case jvm.ArrayLoad():
-            nf = deepcopy(frame)
-            
-            index_name = nf.stack.pop()
-            arr_name = nf.stack.pop()
+    nf.pc = next_pc(nf.pc)
+    return [mk_successor(state, new_frame=nf, constraints=new_const)] 
 
-            index = constraints[index_name].concrete_value()
-            addr = constraints[arr_name][0]
+def step_array_load(state, frame, opr: jvm.ArrayLoad, domain):
+    constraints = state.constraints
+    nf = frame.clone()
+    
+    index_name = nf.stack.pop()
+    arr_name = nf.stack.pop()
 
-            arr = state.heap[addr]
+    index = constraints[index_name].concrete_value()
+    addr = constraints[arr_name][0]
 
-            name = f"{arr}_{index}"
+    arr = state.heap[addr]
 
-            nf.stack.push(name)
-            nf.pc += 1
-            return [mk_successor(nf)] 
-            
-        case jvm.ArrayLength():
-            nf = deepcopy(frame)
-            
-            arr_name = nf.stack.pop()
-            length = constraints[arr_name][1]
-            
-            nf.stack.push(length)
-            nf.pc += 1
-            return [mk_successor(nf)]
-        
-        case jvm.CompareFloating(type=t, onnan=on):
-            nf = deepcopy(frame)
-            
-            n2 = nf.stack.pop()
-            n1 = nf.stack.pop()
-            
-            v1 = constraints[n1]
-            v2 = constraints[n2]
-            
-            res = v1.compare_floating(v2)
-            
-            cmp_res = FloatCmpResult(
-                left_name=n1,
-                right_name=n2,
-                possible_rels=frozenset(res),
-                onnan=on,
-            )
-            
-            new_const = deepcopy(constraints)
-            new_name = f"stack_{len(nf.stack.items)}"
-                
-            new_const[new_name] = cmp_res
-            res_frame = deepcopy(nf)
-            res_frame.stack.push(new_name)
-            res_frame.pc += 1
-            
-            return [mk_successor(new_frame=res_frame, constraints=new_const)]
+    name = make_name(arr, index)
+
+    nf.stack.append(name)
+    nf.pc = next_pc(nf.pc)
+    return [mk_successor(state, nf)] 
+    
+def step_array_length(state, frame, opr: jvm.ArrayLength, domain):
+    nf = frame.clone()
+    
+    arr_name = nf.stack.pop()
+    length = state.constraints[arr_name][1]
+    
+    nf.stack.append(length)
+    nf.pc = next_pc(nf.pc)
+    return [mk_successor(state, nf)]
+
+def step_compare_floating(state, frame, opr: jvm.CompareFloating, domain):
+    constraints = state.constraints
+    nf = frame.clone()
+    
+    n2 = nf.stack.pop()
+    n1 = nf.stack.pop()
+    
+    v1 = constraints[n1]
+    v2 = constraints[n2]
+    
+    res = v1.compare_floating(v2)
+    
+    cmp_res = FloatCmpResult(
+        left_name=n1,
+        right_name=n2,
+        possible_rels=frozenset(res),
+        onnan=opr.onnan,
+    )
+    
+    new_const = constraints.copy()
+    new_name = make_name("stack", len(nf.stack))
         
-        case jvm.InvokeStatic(method=m):
-            new_state = deepcopy(state)
+    new_const[new_name] = cmp_res
+    nf.stack.append(new_name)
+    nf.pc = next_pc(nf.pc)
+    
+    return [mk_successor(state, new_frame=nf, constraints=new_const)]
 
-            caller = new_state.frames.peek()
+def step_invoke_static(state, frame, opr: jvm.InvokeStatic, domain):
+    m = opr.method
+    caller = frame.clone()
 
-            nargs = len(m.extension.params)
-            arg_names = [caller.stack.pop() for _ in range(nargs)][::-1]
+    nargs = len(m.extension.params)
+    arg_names = [caller.stack.pop() for _ in range(nargs)][::-1]
 
-            callee = PerVarFrame(
-                locals={}, 
-                stack=Stack.empty(),
-                pc=PC(method=m, offset=0),
-            )
+    callee = PerVarFrame(
+        locals={}, 
+        stack=[],
+        pc=method_pcs(m)[0],
+    )
 
-            for i, name in enumerate(arg_names):
-                callee.locals[i] = name
-                new_state.constraints[name] = constraints[name]
+    for i, name in enumerate(arg_names):
+        callee.locals[i] = name
+
+    # the arguments keep their names, so the constraints carry over unchanged
+    frames = state.frames[:-1] + [caller, callee]
+    return [AState(heap=state.heap, constraints=state.constraints, frames=frames)]
+
+
+# opcode class -> handler, looked up once per step instead of matching case by case
+STEP_HANDLERS: dict[type[jvm.Opcode], Callable] = {
+    jvm.Push: step_push,
+    jvm.Load: step_load,
+    jvm.Dup: step_dup,
+    jvm.Binary: step_binary,
+    jvm.Return: step_return,
+    jvm.Get: step_get,
+    jvm.Ifz: step_ifz,
+    jvm.New: step_new,
+    jvm.If: step_if,
+    jvm.Store: step_store,
+    jvm.Goto: step_goto,
+    jvm.Incr: step_incr,
+    jvm.NewArray: step_new_array,
+    jvm.ArrayStore: step_array_store,
+    jvm.ArrayLoad: step_array_load,
+    jvm.ArrayLength: step_array_length,
+    jvm.CompareFloating: step_compare_floating,
+    jvm.InvokeStatic: step_invoke_static,
+}
 
-            new_state.frames.push(callee)
 
-            return [new_state]
-        
+# Step the abstract state (possibly returns more states due to branches)
+def step[AV](state: AState[AV], domain: type[AV]) -> Iterable[AState[AV] | str]:
+    assert isinstance(state, AState), "step expects AState"
+    if not state.frames:
+        return []
+
+    frame = state.frames[-1]
+    opr = bc[frame.pc]
+    op_hit.add(opr)
+
+    handler = STEP_HANDLERS.get(type(opr))
+    if handler is None:
+        # unsupported opcode: no successors
+        return None
+    return handler(state, frame, opr, domain)
+        
+
+def step_block[AV](state: AState[AV], domain: type[AV]) -> list[AState[AV] | str]:
+    """
+    Step from a block entry through the rest of its basic block.
+    An instruction that is not a block leader is only reached by falling through
+    from its predecessor, so there is nothing to join it with and the single
+    successor can be stepped right away instead of going through the worklist.
+    """
+    out = []
+    while True:
+        next_states = step(state, domain)
+        if next_states is None:
+            return out
+        succs = [s for s in next_states if not isinstance(s, str)]
+        if len(succs) != 1:
+            out.extend(next_states)
+            return out
+        pc = succs[0].frames[-1].pc
+        if pc.offset in block_leaders(pc.method):
+            out.extend(next_states)
+            return out
+        # keep the error outcomes, continue with the fall-through state
+        out.extend(s for s in next_states if isinstance(s, str))
+        state = succs[0]
+
 
 def manystep[AV](sts: StateSet[AV], domain: type[AV]) -> Iterable[AState[AV] | str]:
-    states = []
+    # A generator: successors are joined back into sts while the worklist is
+    # still being drained, so they never pile up in a batch
     for state in sts.per_instruction():
-        next_states = step(state, domain)
-        if next_states is not None:
-            states.extend(next_states)
-    return states
+        yield from step_block(state, domain)
 
 
 def initialstate_from_method[AV](methodid: jvm.AbsMethodID, domain: type[AV]) -> StateSet[AV]:
     init_pc = PC(methodid, 0)
-    start_frame = PerVarFrame[AV](locals={}, stack=Stack.empty(), pc=init_pc) # New frame, with the method's starting PC
+    start_frame = PerVarFrame[AV](locals={}, stack=[], pc=init_pc) # New frame, with the method's starting PC
     params = methodid.extension.params
     constraints = {}
     
     for i, p in enumerate(params):
-        name = f"arg_{i}"
+        name = make_name("arg", i)
         dead_arg[i] = p
         constraints[name] = domain.top()
         start_frame.locals[i] = name
     
-    state = AState[AV](heap={}, frames=Stack.empty().push(start_frame), constraints=constraints)
+    state = AState[AV](heap={}, frames=[start_frame], constraints=constraints)
     
     return StateSet[AV](
         per_inst={start_frame.pc: state},
-        needswork={start_frame.pc}
+        needswork=deque([start_frame.pc]),
+        in_worklist={start_frame.pc}
     )
 
 # ------- ANALYSIS BEGIN ---------
 
 DOMAIN = Interval
-bc = Bytecode(jpamb.Suite(), dict())
 
 def static_bytecode_analysis(method_list: list[str], file_path: str):
     
@@ -686,22 +915,24 @@ def static_bytecode_analysis(method_list: list[str], file_path: str):
         logger.debug(f"Currently analysing method: {method.extension.name}")
         
         sts = initialstate_from_method(method, DOMAIN)
-        all_ops = list(_suite.method_opcodes(method))
+        bc[PC(method, 0)]   # make sure the method is decoded
+        all_ops = bc.methods[method]
         
         final = set()
         
         # Unbounded Static Analysis
-        while sts.needswork:
-            for s in manystep(sts, DOMAIN):
-                if isinstance(s, str):
-                    final.add(s)
-                else:
-                    sts |= s
+        # (manystep keeps going until the worklist is empty)
+        for s in manystep(sts, DOMAIN):
+            if isinstance(s, str):
+                final.add(s)
+            else:
+                sts |= s
                     
         not_hit = [idx for idx, x in enumerate(all_ops) if x not in op_hit]
 
         
-        dead_store_ops = [idx for idx, x in enumerate(all_ops) if x in dead_store.values()]
+        dead_stores = set(dead_store.values())
+        dead_store_ops = [idx for idx, x in enumerate(all_ops) if x in dead_stores]
         not_hit.extend(dead_store_ops)
         
         
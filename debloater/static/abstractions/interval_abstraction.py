@@ -271,6 +271,16 @@ class Interval:
         hi = min(self.hi, other.hi)
         return Interval.empty() if lo > hi else Interval(lo, hi)
 
+    def widen(self, other: "Interval") -> "Interval":
+        """Widening: push any bound that is still moving to infinity."""
+        if self.is_bottom():
+            return other
+        if other.is_bottom():
+            return self
+        lo = self.lo if self.lo <= other.lo else float("-inf")
+        hi = self.hi if other.hi <= self.hi else float("inf")
+        return Interval(lo, hi)
+
 
     # Pretty-print
     def __repr__(self) -> str:
@@ -1,6 +1,6 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import Iterable, Literal, Tuple, TypeAlias
+from typing import Callable, Iterable, Literal, Tuple, TypeAlias
 
 Sign: TypeAlias = Literal["+", "-", "0"]
 
@@ -18,106 +18,153 @@ def holds(rel: set[int], opr: str) -> bool:
             if opr == "ne":
                 return rel in {-1, 1}
 
-@dataclass(frozen=True)
+# One bit per sign, so a SignSet is a 3-bit mask and the lattice operations
+# are single integer operations
+NEG = 0b001
+ZERO = 0b010
+POS = 0b100
+TOP = NEG | ZERO | POS
+
+SIGN_BITS: dict[Sign, int] = {"-": NEG, "0": ZERO, "+": POS}
+
+# Sign bit of x, indexed by (x > 0) - (x < 0) + 1
+SIGN_OF = (NEG, ZERO, POS)
+
+# x compared to y -> possible relations (-1: x < y, 0: x == y, 1: x > y)
+COMPARE_TABLE: dict[tuple[Sign, Sign], frozenset[int]] = {
+    ("-", "-"): frozenset({-1, 0, 1}),
+    ("-", "0"): frozenset({-1}),
+    ("-", "+"): frozenset({-1}),
+    ("0", "-"): frozenset({1}),
+    ("0", "0"): frozenset({0}),
+    ("0", "+"): frozenset({-1}),
+    ("+", "-"): frozenset({1}),
+    ("+", "0"): frozenset({1}),
+    ("+", "+"): frozenset({-1, 0, 1}),
+}
+
+# repr of every mask, signs in sorted order
+REPR_TABLE = (
+    "SignSet({})", "SignSet({-})", "SignSet({0})", "SignSet({-,0})",
+    "SignSet({+})", "SignSet({+,-})", "SignSet({+,0})", "SignSet({+,-,0})",
+)
+
+# x + y -> possible sign(s)
+ADD_TABLE: dict[tuple[Sign, Sign], frozenset[Sign]] = {
+    ("+", "+"): frozenset({ "+" }),
+    ("+", "0"): frozenset({ "+" }),
+    ("+", "-"): frozenset({ "-", "0", "+" }),
+    ("0", "+"): frozenset({ "+" }),
+    ("0", "0"): frozenset({ "0" }),
+    ("0", "-"): frozenset({ "-" }),
+    ("-", "+"): frozenset({ "-", "0", "+" }),
+    ("-", "0"): frozenset({ "-" }),
+    ("-", "-"): frozenset({ "-" }),
+}
+
+# x * y -> possible sign(s)
+MUL_TABLE: dict[tuple[Sign, Sign], frozenset[Sign]] = {
+    ("+", "+"): frozenset({ "+" }),
+    ("+", "0"): frozenset({ "0" }),
+    ("+", "-"): frozenset({ "-" }),
+    ("0", "+"): frozenset({ "0" }),
+    ("0", "0"): frozenset({ "0" }),
+    ("0", "-"): frozenset({ "0" }),
+    ("-", "+"): frozenset({ "-" }),
+    ("-", "0"): frozenset({ "0" }),
+    ("-", "-"): frozenset({ "+" }),
+}
+
+@dataclass(frozen=True, slots=True)
 class SignSet:
     """
     A finite abstraction of integer sets that records whether 0, positive,
     and/or negative numbers are possible.
+    The signs are stored as a bitmask of NEG, ZERO and POS.
     """
-    signs: frozenset[Sign]
+    mask: int
     
     @classmethod
     def top(cls) -> "SignSet":
-        return cls(frozenset(["+", "-", "0"]))
+        return SIGN_TOP
 
     @classmethod
     def empty(cls) -> "SignSet":
-        return cls(frozenset())
+        return SIGN_BOT
 
     @classmethod
     def of(cls, *signs: Sign) -> "SignSet":
-        return cls(frozenset(signs))
+        mask = 0
+        for s in signs:
+            mask |= SIGN_BITS[s]
+        return _SIGN_POOL[mask]
+
+    @property
+    def signs(self) -> frozenset[Sign]:
+        """The possible signs, as a set of "-", "0" and "+"."""
+        return frozenset(s for s, bit in SIGN_BITS.items() if self.mask & bit)
 
     @classmethod
     def abstract(cls, items: Iterable[int]) -> "SignSet":
         """Map a (finite) set/iterable of ints to the abstract domain."""
-        s: set[Sign] = set()
+        mask = 0
         for x in items:
-            if x == 0:
-                s.add("0")
-            elif x > 0:
-                s.add("+")
-            else:
-                s.add("-")
+            mask |= SIGN_OF[(x > 0) - (x < 0) + 1]
             # Early exit if we have seen all three
-            if len(s) == 3:
-                break
-        return cls(frozenset(s))
+            if mask == TOP:
+                return SIGN_TOP
+        return _SIGN_POOL[mask]
 
     def concretize(self, x: int) -> bool:
         """True iff this abstract element allows x."""
-        return (
-            ("0" in self.signs and x == 0)
-            or ("+" in self.signs and x > 0)
-            or ("-" in self.signs and x < 0)
-        )
+        return bool(self.mask & SIGN_OF[(x > 0) - (x < 0) + 1])
+
+    def concrete_value(self) -> int | None:
+        """The only concrete value allowed, if there is one: {0} is the singleton sign."""
+        return 0 if self.mask == ZERO else None
         
     def __contains__(self, member : int): 
-        if (member == 0 and "0" in self.signs): 
-            return True
-        elif (member > 0 and "+" in self.signs): 
-            return True
-        elif (member < 0 and "-" in self.signs): 
-            return True
-        return False
+        return bool(self.mask & SIGN_OF[(member > 0) - (member < 0) + 1])
 
     def __le__(self, other: "SignSet") -> bool:
-        return self.signs.issubset(other.signs)
+        return self.mask & ~other.mask == 0
 
     def __and__(self, other: "SignSet") -> "SignSet":
         """Meet = greatest lower bound = intersection on signs."""
-        return SignSet(frozenset(self.signs & other.signs))
+        return _SIGN_POOL[self.mask & other.mask]
 
     def __or__(self, other: "SignSet") -> "SignSet":
         """Join = least upper bound = union on signs."""
-        return SignSet(frozenset(self.signs | other.signs))
+        return _SIGN_POOL[self.mask | other.mask]
+
+    def widen(self, other: "SignSet") -> "SignSet":
+        """The lattice is finite, so widening is just the join."""
+        return self | other
 
     def __repr__(self) -> str:
-        inside = ",".join(sorted(self.signs))
-        return f"SignSet({{{inside}}})"
+        return REPR_TABLE[self.mask]
     
     ### Abstract arithmetic
     
     @staticmethod
-    def _lift_bin(a: "SignSet", b: "SignSet", table: dict[tuple[Sign, Sign], set[Sign]]) -> "SignSet":
+    def _lift_bin(a: "SignSet", b: "SignSet", table: dict[tuple[Sign, Sign], frozenset[Sign]]) -> "SignSet":
         out: set[Sign] = set()
         for sa in a.signs:
             for sb in b.signs:
                 out |= table[(sa, sb)]
                 if len(out) == 3:  # reached top {-,0,+}
-                    return SignSet(frozenset(out))
-        return SignSet(frozenset(out))
+                    return SIGN_TOP
+        return SignSet.of(*out)
 
     # Addition
     def add(self, other: "SignSet") -> "SignSet":
-        add_table: dict[tuple[Sign, Sign], set[Sign]] = {
-            # x + y -> possible sign(s)
-            ("+", "+"): { "+" },
-            ("+", "0"): { "+" },
-            ("+", "-"): { "-", "0", "+" },
-            ("0", "+"): { "+" },
-            ("0", "0"): { "0" },
-            ("0", "-"): { "-" },
-            ("-", "+"): { "-", "0", "+" },
-            ("-", "0"): { "-" },
-            ("-", "-"): { "-" },
-        }
-        return self._lift_bin(self, other, add_table)
+        return _SIGN_POOL[ADD_LUT[(self.mask << 3) | other.mask]]
 
     # Negation
     def __neg__(self) -> "SignSet":
-        mapping = {"+" : "-", "-" : "+", "0" : "0"}
-        return SignSet(frozenset(mapping[s] for s in self.signs))
+        # swap the NEG and POS bits
+        m = self.mask
+        return _SIGN_POOL[((m & NEG) << 2) | (m & ZERO) | ((m & POS) >> 2)]
 
     # Subtraction
     def sub(self, other: "SignSet") -> "SignSet":
@@ -125,23 +172,16 @@ class SignSet:
 
     # Multiplication
     def mul(self, other: "SignSet") -> "SignSet":
-        mul_table: dict[tuple[Sign, Sign], set[Sign]] = {
-            ("+", "+"): { "+" },
-            ("+", "0"): { "0" },
-            ("+", "-"): { "-" },
-            ("0", "+"): { "0" },
-            ("0", "0"): { "0" },
-            ("0", "-"): { "0" },
-            ("-", "+"): { "-" },
-            ("-", "0"): { "0" },
-            ("-", "-"): { "+" },
-        }
-        return self._lift_bin(self, other, mul_table)
+        return _SIGN_POOL[MUL_LUT[(self.mask << 3) | other.mask]]
     
     def div(self, other: "SignSet") -> "SignSet":
+        return _SIGN_POOL[DIV_LUT[(self.mask << 3) | other.mask]]
+
+    @staticmethod
+    def _lift_div(a: "SignSet", b: "SignSet") -> "SignSet":
         out: set[Sign] = set()
-        for sa in self.signs:
-            for sb in other.signs:
+        for sa in a.signs:
+            for sb in b.signs:
                 if sb == "0":
                     # Division by zero is undefined: skip this pair
                     continue
@@ -152,17 +192,12 @@ class SignSet:
                 else:                   # +/- or -/+ -> -
                     out.add("-")
                 if len(out) == 3:       # reached top {-,0,+}
-                    return SignSet(frozenset(out))
-        return SignSet(frozenset(out))
+                    return SIGN_TOP
+        return SignSet.of(*out)
 
     # Absolute value
     def abs(self) -> "SignSet":
-        out: set[Sign] = set()
-        if "-" in self.signs or "+" in self.signs:
-            out.add("+")
-        if "0" in self.signs:
-            out.add("0")
-        return SignSet(frozenset(out if out else set()))
+        return _SIGN_POOL[(POS if self.mask & (NEG | POS) else 0) | (self.mask & ZERO)]
 
     def compare(self, other: "SignSet", op: str) -> frozenset[bool]:
         if not isinstance(other, SignSet):
@@ -171,11 +206,11 @@ class SignSet:
         diff = self.sub(other)
         rels: set[int] = set()
 
-        if "-" in diff.signs:
+        if diff.mask & NEG:
             rels.add(-1)
-        if "0" in diff.signs:
+        if diff.mask & ZERO:
             rels.add(0)
-        if "+" in diff.signs:
+        if diff.mask & POS:
             rels.add(1)
             
         may_be_true = any(holds(r, op) for r in rels)
@@ -192,32 +227,34 @@ class SignSet:
     @classmethod
     def constrain(cls, prev: "SignSet", other: "SignSet", op: "str") -> Tuple["SignSet",  "SignSet"]:
         valid_signs: set[Sign] = set()
-        
-        compare_table = {
-            ("-", "-"): {-1, 0, 1},
-            ("-", "0"): {-1},        
-            ("-", "+"): {-1},       
-            ("0", "-"): {1},       
-            ("0", "0"): {0},        
-            ("0", "+"): {-1},       
-            ("+", "-"): {1},        
-            ("+", "0"): {1},         
-            ("+", "+"): {-1, 0, 1},
-        }
 
         for sx in prev.signs:
             for sy in other.signs:
-                rels = compare_table[(sx, sy)]
+                rels = COMPARE_TABLE[(sx, sy)]
                 if any(holds(r, op) for r in rels):
                     valid_signs.add(sx)
                     break  # no need to test more sy for this sx
 
-        true_set = cls(frozenset(valid_signs))
-        false_set = cls(frozenset(prev.signs-valid_signs))
+        true_set = cls.of(*valid_signs)
+        false_set = _SIGN_POOL[prev.mask & ~true_set.mask]
         
         return true_set, false_set
 
-    # Pretty
-    def __repr__(self) -> str:
-        inside = ",".join(sorted(self.signs))
-        return f"SignSet({{{inside}}})"
\ No newline at end of file
+
+# The eight SignSets, indexed by mask. Every operation returns one of these
+# instead of allocating a new instance.
+_SIGN_POOL: tuple[SignSet, ...] = tuple(SignSet(mask) for mask in range(8))
+
+SIGN_TOP = _SIGN_POOL[TOP]
+SIGN_BOT = _SIGN_POOL[0]
+
+def _lut(op: Callable[[SignSet, SignSet], SignSet]) -> tuple[int, ...]:
+    """Result mask of op for every pair of masks, indexed by (a << 3) | b."""
+    return tuple(
+        op(_SIGN_POOL[a], _SIGN_POOL[b]).mask
+        for a in range(8) for b in range(8)
+    )
+
+ADD_LUT = _lut(lambda a, b: SignSet._lift_bin(a, b, ADD_TABLE))
+MUL_LUT = _lut(lambda a, b: SignSet._lift_bin(a, b, MUL_TABLE))
+DIV_LUT = _lut(SignSet._lift_div)
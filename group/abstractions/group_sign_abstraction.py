@@ -4,6 +4,13 @@ from typing import Iterable, Literal, TypeAlias
 
 Sign: TypeAlias = Literal["+", "-", "0"]
 
+# one bit per sign, see SignSet.bits
+NEG = 0b001
+ZERO = 0b010
+POS = 0b100
+TOP = NEG | ZERO | POS
+SIGN_BITS: dict[Sign, int] = {"-": NEG, "0": ZERO, "+": POS}
+
 # TODO: Create interface (eg. Domain for all the different abstractions)
 @dataclass(frozen=True)
 class SignSet:
@@ -11,63 +18,70 @@ class SignSet:
     A finite abstraction of integer sets that records whether 0, positive,
     and/or negative numbers are possible.
     """
-    signs: frozenset[Sign]
+    bits: int   # the signs as a 3-bit mask (NEG | ZERO | POS)
     
     @classmethod
     def top(cls) -> "SignSet":
-        return cls(frozenset(["+", "-", "0"]))
+        return _TOP
 
     @classmethod
     def empty(cls) -> "SignSet":
-        return cls(frozenset())
+        return _EMPTY
 
     @classmethod
     def of(cls, *signs: Sign) -> "SignSet":
-        return cls(frozenset(signs))
+        bits = 0
+        for s in signs:
+            bits |= SIGN_BITS[s]
+        return cls(bits)
 
     @classmethod
     def abstract(cls, items: Iterable[int]) -> "SignSet":
         """Map a (finite) set/iterable of ints to the abstract domain."""
-        s: set[Sign] = set()
+        bits = 0
         for x in items:
             if x == 0:
-                s.add("0")
+                bits |= ZERO
             elif x > 0:
-                s.add("+")
+                bits |= POS
             else:
-                s.add("-")
+                bits |= NEG
             # Early exit if we have seen all three
-            if len(s) == 3:
+            if bits == TOP:
                 break
-        return cls(frozenset(s))
+        return cls(bits)
+
+    @property
+    def signs(self) -> frozenset[Sign]:
+        return frozenset(s for s, bit in SIGN_BITS.items() if self.bits & bit)
 
     def concretize(self, x: int) -> bool:
         """True iff this abstract element allows x."""
-        return (
-            ("0" in self.signs and x == 0)
-            or ("+" in self.signs and x > 0)
-            or ("-" in self.signs and x < 0)
+        return bool(
+            (self.bits & ZERO and x == 0)
+            or (self.bits & POS and x > 0)
+            or (self.bits & NEG and x < 0)
         )
         
     def __contains__(self, member : int): 
-        if (member == 0 and "0" in self.signs): 
+        if (member == 0 and self.bits & ZERO): 
             return True
-        elif (member > 0 and "+" in self.signs): 
+        elif (member > 0 and self.bits & POS): 
             return True
-        elif (member < 0 and "-" in self.signs): 
+        elif (member < 0 and self.bits & NEG): 
             return True
         return False
 
     def __le__(self, other: "SignSet") -> bool:
-        return self.signs.issubset(other.signs)
+        return self.bits & ~other.bits == 0
 
     def __and__(self, other: "SignSet") -> "SignSet":
         """Meet = greatest lower bound = intersection on signs."""
-        return SignSet(frozenset(self.signs & other.signs))
+        return SignSet(self.bits & other.bits)
 
     def __or__(self, other: "SignSet") -> "SignSet":
         """Join = least upper bound = union on signs."""
-        return SignSet(frozenset(self.signs | other.signs))
+        return SignSet(self.bits | other.bits)
 
     def __repr__(self) -> str:
         inside = ",".join(sorted(self.signs))
@@ -82,8 +96,8 @@ class SignSet:
             for sb in b.signs:
                 out |= table[(sa, sb)]
                 if len(out) == 3:  # reached top {-,0,+}
-                    return SignSet(frozenset(out))
-        return SignSet(frozenset(out))
+                    return _TOP
+        return SignSet.of(*out)
 
     # Addition
     def add(self, other: "SignSet") -> "SignSet":
@@ -103,8 +117,8 @@ class SignSet:
 
     # Negation
     def __neg__(self) -> "SignSet":
-        mapping = {"+" : "-", "-" : "+", "0" : "0"}
-        return SignSet(frozenset(mapping[s] for s in self.signs))
+        b = self.bits
+        return SignSet((b & ZERO) | (NEG if b & POS else 0) | (POS if b & NEG else 0))
 
     # Subtraction
     def sub(self, other: "SignSet") -> "SignSet":
@@ -139,17 +153,12 @@ class SignSet:
                 else:                   # +/- or -/+ -> -
                     out.add("-")
                 if len(out) == 3:       # reached top {-,0,+}
-                    return SignSet(frozenset(out))
-        return SignSet(frozenset(out))
+                    return _TOP
+        return SignSet.of(*out)
 
     # Absolute value
     def abs(self) -> "SignSet":
-        out: set[Sign] = set()
-        if "-" in self.signs or "+" in self.signs:
-            out.add("+")
-        if "0" in self.signs:
-            out.add("0")
-        return SignSet(frozenset(out if out else set()))
+        return SignSet((POS if self.bits & (NEG | POS) else 0) | (self.bits & ZERO))
 
     # Pretty
     def __repr__(self) -> str:
@@ -190,4 +199,9 @@ class SignSet:
         if low <= 0 <= high or "0" in prev.signs or "0" in curr.signs:
             new_signs.add("0")
 
-        return SignSet(frozenset(new_signs))
\ No newline at end of file
+        return SignSet.of(*new_signs)
+
+
+# SignSet is immutable, so the constant lattice elements are shared
+_TOP = SignSet(TOP)
+_EMPTY = SignSet(0)
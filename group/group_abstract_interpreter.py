@@ -2,19 +2,20 @@ from dataclasses import dataclass
 from enum import Enum, auto
 import string
 from typing import List, Dict, Self, Tuple, Optional, Iterable, Union, Any, FrozenSet
-from copy import deepcopy
 from jpamb import jvm
 import jpamb
 from collections import defaultdict
-from solutions.interpreter import PC, Bytecode, Stack, State
-from group.abstractions.group_sign_abstraction import SignSet
+from functools import lru_cache
+from itertools import zip_longest
+from solutions.interpreter import PC, State
+from group.abstractions.group_sign_abstraction import SignSet, NEG, ZERO, POS, TOP
 
-op_hit = set()
+op_hit: dict[jvm.AbsMethodID, bytearray] = {}   # method -> 1 for each offset that was stepped
 
 @dataclass
 class PerVarFrame[AV]:
     locals: Dict[int, str]
-    stack: Stack[AV]
+    stack: list[AV]
     pc: PC
 
     @classmethod
@@ -24,7 +25,7 @@ class PerVarFrame[AV]:
             locs = {i: AV.abstract([locals_conc[i]]) if i in locals_conc else AV.empty() for i in range(max_i + 1)}
         else:
             locs = {}
-        st = Stack([AV.abstract([x]) for x in stack_conc])
+        st = [AV.abstract([x]) for x in stack_conc]
         return cls(locs, st, pc)
 
     ## Lattice methods (order, meet, join) ##
@@ -37,32 +38,34 @@ class PerVarFrame[AV]:
         for k in self.locals:
             if not (self.locals[k] <= other.locals[k]):
                 return False
-        h = max(len(self.stack.items), len(other.stack.items))
-        def get(s, i): return s.items[i] if i < len(s.items) else AV.empty()
-        return all(get(self.stack, i) <= get(other.stack, i) for i in range(h))
+        s1, s2 = self.stack, other.stack
+        empty = AV.empty() if len(s1) != len(s2) else None   # pads the shorter stack
+        for v1, v2 in zip_longest(s1, s2, fillvalue=empty):
+            if not (v1 <= v2):
+                return False
+        return True
 
     def meet(self, other: "PerVarFrame") -> Optional["PerVarFrame"]:
         if self.pc != other.pc or set(self.locals.keys()) != set(other.locals.keys()):
             return None
         new_locs = {k: self.locals[k] & other.locals[k] for k in self.locals}
-        h = min(len(self.stack.items), len(other.stack.items))
-        new_stack = Stack([self.stack.items[i] & other.stack.items[i] for i in range(h)])
+        new_stack = [v1 & v2 for v1, v2 in zip(self.stack, other.stack)]
         return PerVarFrame(new_locs, new_stack, self.pc)
 
     def join(self, other: "PerVarFrame") -> Optional["PerVarFrame"]:
         if self.pc != other.pc or set(self.locals.keys()) != set(other.locals.keys()):
             return None
-        new_locs = dict(self.locals)
+        new_locs = self.locals.copy()
         new_locs.update(other.locals)
-        h = max(len(self.stack.items), len(other.stack.items))
-        def get(s, i): return s.items[i] if i < len(s.items) else AV.empty()
-        new_stack = Stack([get(self.stack, i) | get(other.stack, i) for i in range(h)])
+        s1, s2 = self.stack, other.stack
+        empty = AV.empty() if len(s1) != len(s2) else None   # pads the shorter stack
+        new_stack = [v1 | v2 for v1, v2 in zip_longest(s1, s2, fillvalue=empty)]
         return PerVarFrame(new_locs, new_stack, self.pc)
     
     def clone(self) -> "PerVarFrame":
         return PerVarFrame(
             locals=self.locals.copy(),
-            stack=Stack(self.stack.items.copy()),
+            stack=self.stack.copy(),
             pc=self.pc
         )
     
@@ -70,9 +73,9 @@ class PerVarFrame[AV]:
     #widening
     def widen(self, other: "PerVarFrame") -> "PerVarFrame":
         new_locs = {k: SignSet.widen(self.locals[k], other.locals[k]) for k in self.locals}
-        h = max(len(self.stack.items), len(other.stack.items))
-        def get(s, i): return s.items[i] if i < len(s.items) else SignSet.empty()
-        new_stack = Stack([SignSet.widen(get(self.stack, i), get(other.stack, i)) for i in range(h)])
+        s1, s2 = self.stack, other.stack
+        empty = SignSet.empty() if len(s1) != len(s2) else None   # pads the shorter stack
+        new_stack = [SignSet.widen(v1, v2) for v1, v2 in zip_longest(s1, s2, fillvalue=empty)]
         return PerVarFrame(new_locs, new_stack, self.pc)
 
 
@@ -82,69 +85,85 @@ class PerVarFrame[AV]:
 class AState[AV]:
     heap: Dict[int, str]         # abstract heap (addresses -> variable name)
     constraints: Dict[str, AV]   # variable constraints (variable name -> abstract value) for both state heap and frame locals
-    frames: Stack[PerVarFrame]   # stack of PerVarFrame
+    frames: list[PerVarFrame]    # call stack, innermost frame last
 
     @classmethod
     def abstract(cls, s: State) -> "AState":
         heap_abs: Dict[int, AV] = {addr: AV.abstract([val]) for addr, val in s.heap.items()}
-        frames_abs = Stack([PerVarFrame.abstract(f.locals, f.stack.items, f.pc) for f in s.frames.items])
+        frames_abs = [PerVarFrame.abstract(f.locals, f.stack.items, f.pc) for f in s.frames.items]
         return cls(heap_abs, frames_abs)
 
     def __le__(self, other: "AState") -> bool:
-        # heap: pointwise <= 
-        for addr in set(self.heap) | set(other.heap):
-            if not (self.heap.get(addr, AV.empty()) <= other.heap.get(addr, AV.empty())): # if addr does not exist, treat as empty
-                return False
+        # self <= other iff other |= self would not change other (see __ior__):
+        # heap and locals hold names, so the names must agree and their constraints be covered
+        c_self, c_other = self.constraints, other.constraints
+
+        def mapping_le(src: Dict[int, str], dst: Dict[int, str]) -> bool:
+            for k, n in src.items():
+                if dst.get(k) != n or n not in c_other:
+                    return False
+                if not (c_self.get(n, c_other[n]) <= c_other[n]):
+                    return False
+            return True
+
+        if not mapping_le(self.heap, other.heap):
+            return False
         # frames: require same number of frames (same call depth) and pointwise <=
-        if len(self.frames.items) != len(other.frames.items):
+        if len(self.frames) != len(other.frames):
             return False
-        for f1, f2 in zip(self.frames.items, other.frames.items):
-            if not (f1 <= f2):
+        for f1, f2 in zip(self.frames, other.frames):
+            if f1.pc != f2.pc or len(f1.stack) != len(f2.stack):
+                return False
+            if not mapping_le(f1.locals, f2.locals):
                 return False
+            # the stacks hold abstract values directly
+            for v1, v2 in zip(f1.stack, f2.stack):
+                if not (v1 <= v2):
+                    return False
         return True
 
     def meet(self, other: "AState[AV]") -> Optional["AState[AV]"]:
         # heap meet
+        addrs = self.heap.keys() | other.heap.keys()
+        empty = AV.empty() if addrs else None
         new_heap = {
-            addr: self.heap.get(addr, AV.empty()) & other.heap.get(addr, AV.empty()) # if addr does not exist, treat as empty
-            for addr in set(self.heap) | set(other.heap)
+            addr: self.heap.get(addr, empty) & other.heap.get(addr, empty) # if addr does not exist, treat as empty
+            for addr in addrs
         }
         # frames: require same count and all pairwise meets succeed
-        if len(self.frames.items) != len(other.frames.items):
+        if len(self.frames) != len(other.frames):
             return None
-        new_frames = []
-        for f1, f2 in zip(self.frames.items, other.frames.items):
+        new_frames = [None] * len(self.frames)
+        for i, (f1, f2) in enumerate(zip(self.frames, other.frames)):
             m = f1.meet(f2)
             if m is None:
                 return None
-            new_frames.append(m)
-        return AState(new_heap, Stack(new_frames))
+            new_frames[i] = m
+        return AState(new_heap, new_frames)
 
     def join(self, other: "AState") -> Optional["AState"]:
         # heap join
         new_heap = {
             addr: self.heap.get(addr) | other.heap.get(addr)
-            for addr in set(self.heap) | set(other.heap)
+            for addr in self.heap.keys() | other.heap.keys()
         }
         
         # frames: require same count and all pairwise joins succeed
-        if len(self.frames.items) != len(other.frames.items):
+        if len(self.frames) != len(other.frames):
             return None
-        new_frames = []
-        for f1, f2 in zip(self.frames.items, other.frames.items):
-            print(f"Frame1: {f1}")
-            print(f"Frame2: {f2}")
+        new_frames = [None] * len(self.frames)
+        for i, (f1, f2) in enumerate(zip(self.frames, other.frames)):
             j = f1.join(f2)
             if j is None:
                 return None
-            new_frames.append(j)
-        return AState(new_heap, Stack(new_frames))
+            new_frames[i] = j
+        return AState(new_heap, new_frames)
     
     
     def clone(self) -> "AState[AV]":
         return AState(
             heap=self.heap.copy(),
-            frames=Stack([f.clone() for f in self.frames.items]),
+            frames=[f.clone() for f in self.frames],
             constraints=self.constraints.copy()
         )
     
@@ -188,14 +207,14 @@ class AState[AV]:
         merge_mapping(self.heap, other.heap, "heap")
         
         # 2. Frames: pointwise by depth
-        for f1, f2 in zip(self.frames.items, other.frames.items, strict=True):
+        for f1, f2 in zip(self.frames, other.frames, strict=True):
             assert f1.pc == f2.pc, f"PC differs: {f1.pc} != {f2.pc}"
 
             # locals: Dict[int, str]
             merge_mapping(f1.locals, f2.locals, "local")
 
             # stack: same height, elementwise names (str)
-            s1, s2 = f1.stack.items, f2.stack.items
+            s1, s2 = f1.stack, f2.stack
             assert len(s1) == len(s2), f"stacks should be of the same size to join"
             for i, (v1, v2) in enumerate(zip(s1, s2)):
                 s1[i] = v1 | v2
@@ -204,17 +223,18 @@ class AState[AV]:
 
     #widening
     def widen(self, other: "AState[AV]") -> "AState[AV]":
-        new_heap = {addr: AV.widen(self.heap.get(addr, AV.empty()), other.heap.get(addr, AV.empty()))
-                    for addr in set(self.heap) | set(other.heap)}
+        addrs = self.heap.keys() | other.heap.keys()
+        names = self.constraints.keys() | other.constraints.keys()
+        empty = AV.empty() if addrs or names else None
+        new_heap = {addr: AV.widen(self.heap.get(addr, empty), other.heap.get(addr, empty))
+                    for addr in addrs}
         # For frames, do similar widening for locals & stack
-        new_frames = []
-        for f1, f2 in zip(self.frames.items, other.frames.items):
-            new_frames.append(f1.widen(f2))
+        new_frames = [f1.widen(f2) for f1, f2 in zip(self.frames, other.frames)]
         # constraints: widen each variable's AV
-        new_constraints = {k: AV.widen(self.constraints.get(k, AV.empty()),
-                                       other.constraints.get(k, AV.empty()))
-        for k in set(self.constraints) | set(other.constraints)}
-        return AState(new_heap, Stack(new_frames), new_constraints)
+        new_constraints = {k: AV.widen(self.constraints.get(k, empty),
+                                       other.constraints.get(k, empty))
+        for k in names}
+        return AState(new_heap, new_frames, new_constraints)
 
 
         
@@ -228,12 +248,13 @@ class StateSet[AV]:
     needswork : set[PC]
 
     def per_instruction(self):
-        for pc in self.needswork: 
+        # reverse postorder: a PC's predecessors are (mostly) stepped before it
+        for pc in sorted(self.needswork, key=_rpo_key): 
             yield (pc, self.per_inst[pc])
 
     # sts |= astate
     def __ior__(self, astate: AState[AV]):
-        pc = astate.frames.peek().pc
+        pc = astate.frames[-1].pc
         old = self.per_inst.get(pc)
 
         if old is None:
@@ -242,6 +263,10 @@ class StateSet[AV]:
             self.needswork.add(pc)
             return self
         
+        # Nothing new: skip the clone and the join
+        if astate <= old:
+            return self
+        
         new_state = old.clone()
         new_state |= astate
         
@@ -276,7 +301,7 @@ class UnboundedAnalyzer:
                     sts.per_inst[pc] = res
                     continue
 
-                new_pc = res.frames.peek().pc
+                new_pc = res.frames[-1].pc
                 old_state = sts.per_inst.get(new_pc)
 
                 if old_state is None:
@@ -312,181 +337,276 @@ class UnboundedAnalyzer:
 
 _suite = jpamb.Suite()
 
-def _opcode_at(pc: PC):
-    ops = list(_suite.method_opcodes(pc.method))
-    return ops[pc.offset]
+# Ifz condition -> signs (SignSet bits) of the operand for which the jump is / is not taken
+_IFZ_TRUE = {"eq": ZERO, "ne": NEG | POS, "lt": NEG, "le": NEG | ZERO, "gt": POS, "ge": POS | ZERO}
+_IFZ_FALSE = {cond: TOP & ~mask for cond, mask in _IFZ_TRUE.items()}
+_opcode_cache: dict[jvm.AbsMethodID, tuple] = {}   # method -> its decoded opcodes
+
+def _opcodes(method: jvm.AbsMethodID) -> tuple:
+    ops = _opcode_cache.get(method)
+    if ops is None:
+        ops = tuple(_suite.method_opcodes(method))
+        _opcode_cache[method] = ops
+    return ops
+
+_rpo_cache: dict[jvm.AbsMethodID, dict[int, int]] = {}   # method -> offset -> reverse postorder index
+
+def _rpo(method: jvm.AbsMethodID) -> dict[int, int]:
+    """Reverse postorder of the method's control flow graph, from offset 0."""
+    order = _rpo_cache.get(method)
+    if order is not None:
+        return order
+    ops = _opcodes(method)
+
+    def successors(i: int) -> list[int]:
+        op = ops[i]
+        if isinstance(op, (jvm.Return, jvm.Throw)):
+            return []
+        if isinstance(op, jvm.Goto):
+            return [op.target]
+        nxt = [i + 1] if i + 1 < len(ops) else []
+        if isinstance(op, (jvm.If, jvm.Ifz)):
+            return [op.target] + nxt
+        return nxt
+
+    postorder = []
+    seen = {0}
+    stack = [(0, iter(successors(0)))]
+    while stack:
+        i, succs = stack[-1]
+        for j in succs:
+            if j not in seen:
+                seen.add(j)
+                stack.append((j, iter(successors(j))))
+                break
+        else:
+            stack.pop()
+            postorder.append(i)
+    order = {i: n for n, i in enumerate(reversed(postorder))}
+    _rpo_cache[method] = order
+    return order
+
+def _rpo_key(pc: PC) -> int:
+    # offsets not reachable from the entry go last
+    return _rpo(pc.method).get(pc.offset, len(_opcodes(pc.method)))
+
+def _hits(method: jvm.AbsMethodID) -> bytearray:
+    hits = op_hit.get(method)
+    if hits is None:
+        hits = op_hit[method] = bytearray(len(_opcodes(method)))
+    return hits
+
+
+@lru_cache(maxsize=None)
+def _pc(method: jvm.AbsMethodID, offset: int) -> PC:
+    """Interned PC: equal PCs are the same object, so per_inst lookups hit the identity check."""
+    return PC(method, offset)
+
+def _next_pc(pc: PC) -> PC:
+    return _pc(pc.method, pc.offset + 1)
+
+
+# helper to build successor states (clone to isolate)
+def _mk_successor(state: AState, new_frame: PerVarFrame) -> AState:
+    new_state = state.clone()
+    new_state.frames[-1] = new_frame  # replace top frame
+    return new_state
+
+
+# Opcode handlers (similar to dynamic interpreter, but on AV).
+# Each one takes (state, frame, opr, domain), where frame is a copy of the top frame of state.
+
+def _step_push(state, frame, opr: jvm.Push, domain):
+    new_frame = frame.clone()
+    new_frame.stack.append(domain.abstract([opr.value.value]))
+    new_frame.pc = _next_pc(new_frame.pc)
+    return [_mk_successor(state, new_frame)]
+
+def _step_load(state, frame, opr: jvm.Load, domain):
+    new_frame = frame.clone()
+    # locals are AV in PerVarFrame.abstract, if missing, use empty
+    var_name = new_frame.locals.get(opr.index, domain.empty())
+    val = state.constraints.get(var_name)
+    new_frame.stack.append(val)
+    new_frame.pc = _next_pc(new_frame.pc)
+    return [_mk_successor(state, new_frame)]
+
+def _step_dup(state, frame, opr: jvm.Dup, domain):
+    new_frame = frame.clone()
+    v = new_frame.stack[-1]
+    new_frame.stack.append(v)
+    new_frame.pc = _next_pc(new_frame.pc)
+    return [_mk_successor(state, new_frame)]
+
+def _step_binary(state, frame, opr: jvm.Binary, domain):
+    if not isinstance(opr.type, jvm.Int):
+        return None
+    op = opr.operant
+    new_frame = frame.clone()
+    items = new_frame.stack
+    # pop order preserved: v2 = top, v1 = next
+    v2 = items.pop()
+    v1 = items.pop()
+    if op == jvm.BinaryOpr.Add:
+        res = v1.add(v2)
+    elif op == jvm.BinaryOpr.Sub:
+        res = v1.sub(v2)
+    elif op == jvm.BinaryOpr.Mul:
+        res = v1.mul(v2)
+    elif op == jvm.BinaryOpr.Div:
+        res = v1.div(v2)
+    else:
+        # Rem and others: over-approximate -> TOP
+        res = domain.top()
+    items.append(res)
+    new_frame.pc = _next_pc(new_frame.pc)
+    return [_mk_successor(state, new_frame)]
+
+def _step_return(state, frame, opr: jvm.Return, domain):
+    t = opr.type
+    new_state = state.clone()
+    top_frame = new_state.frames.pop()
+    if t:
+        ret = top_frame.stack.pop()
+    if new_state.frames:
+        caller = new_state.frames[-1]
+        if t:
+            caller.stack.append(ret)
+        caller.pc = _next_pc(caller.pc)
+        return [new_state]
+    else:
+        return ["ok"]
+
+def _step_get(state, frame, opr: jvm.Get, domain):
+    new_frame = frame.clone()
+    # $assertionsDisabled pushed as 0
+    new_frame.stack.append(domain.abstract([0]))
+    new_frame.pc = _next_pc(new_frame.pc)
+    return [_mk_successor(state, new_frame)]
+
+def _step_ifz(state, frame, opr: jvm.Ifz, domain):
+    v = frame.stack.pop()
+    cond = opr.condition
+    bits = v.bits
+
+    def push_target(tgt_pc_offset):
+        nf = frame.clone()
+        nf.pc = _pc(frame.pc.method, tgt_pc_offset)
+        return _mk_successor(state, nf)
+
+    # decide branch feasibility: does v allow a sign for which the branch is taken?
+    def branch_possible(cond_name: str, truth: bool) -> bool:
+        table = _IFZ_TRUE if truth else _IFZ_FALSE
+        if cond_name not in table:
+            return True
+        return bool(bits & table[cond_name])
+
+    targets: list[AState | str] = []
+    # true branch -> jump target
+    if branch_possible(cond, True):
+        targets.append(push_target(opr.target))
+    # false branch -> fall-through
+    if branch_possible(cond, False):
+        nf = frame.clone()
+        nf.pc = _next_pc(nf.pc)
+        targets.append(_mk_successor(state, nf))
+    return targets
+
+def _step_new(state, frame, opr: jvm.New, domain):
+    if opr.classname == jvm.ClassName("java/lang/AssertionError"):
+        return ["assertion error"]
+    # otherwise continue
+    new_frame = frame.clone()
+    new_frame.pc = _next_pc(new_frame.pc)
+    return [_mk_successor(state, new_frame)]
+
+def _step_if(state, frame, opr: jvm.If, domain):
+    # two-operand comparison: over-approximate and emit both branches if possible
+    items = frame.stack
+    v2 = items.pop()
+    v1 = items.pop()
+    cond = opr.condition
+
+    def possible_true():
+        # very conservative: assume true unless impossible for all combinations
+        return True
+
+    targets: list[AState | str] = []
+    if possible_true():
+        nf = frame.clone()
+        nf.pc = _pc(frame.pc.method, opr.target)
+        targets.append(_mk_successor(state, nf))
+    # false branch
+    nf2 = frame.clone()
+    nf2.pc = _next_pc(nf2.pc)
+    targets.append(_mk_successor(state, nf2))
+    return targets
+
+def _step_unsupported(state, frame, opr, domain):
+    return None
+
+
+# opcode class -> handler
+_STEP_HANDLERS = {
+    jvm.Push: _step_push,
+    jvm.Load: _step_load,
+    jvm.Dup: _step_dup,
+    jvm.Binary: _step_binary,
+    jvm.Return: _step_return,
+    jvm.Get: _step_get,
+    jvm.Ifz: _step_ifz,
+    jvm.New: _step_new,
+    jvm.If: _step_if,
+}
+
+_program_cache: dict[jvm.AbsMethodID, tuple] = {}   # method -> (handler, opcode) per offset
+
+def _program(method: jvm.AbsMethodID) -> tuple:
+    """The method's opcodes lowered once to their handlers, so step does no dispatch."""
+    prog = _program_cache.get(method)
+    if prog is None:
+        prog = tuple((_STEP_HANDLERS.get(type(op), _step_unsupported), op) for op in _opcodes(method))
+        _program_cache[method] = prog
+    return prog
 
 # Step the abstract state (possibly returns more states due to branches)
 def step[AV](state: AState[AV], domain: type[AV]) -> Iterable[AState[AV] | str]:
     assert isinstance(state, AState), "step expects AState"
-    if not state.frames or not state.frames.items:
+    if not state.frames:
         return []  # nothing to do
 
-    frame = deepcopy(state.frames.peek())
-    constraints = deepcopy(state.constraints)
+    # abstract values are immutable, so copying containers is enough to isolate states
+    frame = state.frames[-1].clone()
     pc = frame.pc
     
-    opr = _opcode_at(pc)
+    handler, opr = _program(pc.method)[pc.offset]
     
-    op_hit.add(opr)
-
-    # helper to build successor states (deepcopy to isolate)
-    def mk_successor(new_frame: PerVarFrame) -> AState:
-        new_state = deepcopy(state)
-        new_state.frames.items[-1] = new_frame  # replace top frame
-        return new_state
-
-    # handle instructions (similar to dynamic interpreter, but on AV)
-    match opr:
-        case jvm.Push(value=v):
-            new_frame = deepcopy(frame)
-            new_frame.stack.push(domain.abstract([v.value]))
-            new_frame.pc += 1
-            return [mk_successor(new_frame)]
-
-        case jvm.Load(type=t, index=i):
-            new_frame = deepcopy(frame)
-            # locals are AV in PerVarFrame.abstract, if missing, use empty
-            var_name = new_frame.locals.get(i, domain.empty())
-            val = constraints.get(var_name)
-            new_frame.stack.push(val)
-            new_frame.pc += 1
-            return [mk_successor(new_frame)]
-
-        case jvm.Dup():
-            new_frame = deepcopy(frame)
-            v = new_frame.stack.peek()
-            new_frame.stack.push(v)
-            new_frame.pc += 1
-            return [mk_successor(new_frame)]
-
-        case jvm.Binary(type=jvm.Int(), operant=op):
-            new_frame = deepcopy(frame)
-            # pop order preserved: v2 = top, v1 = next
-            v2 = new_frame.stack.pop()
-            v1 = new_frame.stack.pop()
-            if op == jvm.BinaryOpr.Add:
-                res = v1.add(v2)
-            elif op == jvm.BinaryOpr.Sub:
-                res = v1.sub(v2)
-            elif op == jvm.BinaryOpr.Mul:
-                res = v1.mul(v2)
-            elif op == jvm.BinaryOpr.Div:
-                res = v1.div(v2)
-            else:
-                # Rem and others: over-approximate -> TOP
-                res = AV(SignSet.of("+", "0", "-"))
-            new_frame.stack.push(res)
-            new_frame.pc += 1
-            return [mk_successor(new_frame)]
-
-        case jvm.Return(type=t):
-            new_state = deepcopy(state)
-            top_frame = new_state.frames.pop()
-            if t:
-                ret = top_frame.stack.pop()
-            if new_state.frames:
-                caller = new_state.frames.peek()
-                if t:
-                    caller.stack.push(ret)
-                caller.pc += 1
-                return [new_state]
-            else:
-                return ["ok"]
-
-        case jvm.Get(field=field):
-            new_frame = deepcopy(frame)
-            # $assertionsDisabled pushed as 0
-            new_frame.stack.push(domain.abstract([0]))
-            new_frame.pc += 1
-            return [mk_successor(new_frame)]
-
-        case jvm.Ifz():
-            v = frame.stack.pop()
-            cond = opr.condition
-            can_zero = "0" in v.signs
-            can_pos = "+" in v.signs
-            can_neg = "-" in v.signs
-
-            def push_target(tgt_pc_offset):
-                nf = deepcopy(frame)
-                nf.pc = PC(frame.pc.method, tgt_pc_offset)
-                return mk_successor(nf)
-
-            # decide branch feasibility
-            def branch_possible(cond_name: str, truth: bool) -> bool:
-                if cond_name == "eq":
-                    return truth and can_zero or (not truth and (can_pos or can_neg))
-                if cond_name == "ne":
-                    return truth and (can_pos or can_neg) or (not truth and can_zero)
-                if cond_name == "lt":
-                    return truth and can_neg or (not truth and (can_zero or can_pos))
-                if cond_name == "le":
-                    return truth and (can_neg or can_zero) or (not truth and can_pos)
-                if cond_name == "gt":
-                    return truth and can_pos or (not truth and (can_zero or can_neg))
-                if cond_name == "ge":
-                    return truth and (can_pos or can_zero) or (not truth and can_neg)
-                return True
-
-            targets: list[AState | str] = []
-            # true branch -> jump target
-            if branch_possible(cond, True):
-                targets.append(push_target(opr.target))
-            # false branch -> fall-through
-            if branch_possible(cond, False):
-                nf = deepcopy(frame)
-                nf.pc += 1
-                targets.append(mk_successor(nf))
-            return targets
-
-        case jvm.New(offset, classname):
-            if classname == jvm.ClassName("java/lang/AssertionError"):
-                return ["assertion error"]
-            # otherwise continue
-            new_frame = deepcopy(frame)
-            new_frame.pc += 1
-            return [mk_successor(new_frame)]
-
-        case jvm.If():
-            # two-operand comparison: over-approximate and emit both branches if possible
-            v2 = frame.stack.pop()
-            v1 = frame.stack.pop()
-            cond = opr.condition
-
-            def possible_true():
-                # very conservative: assume true unless impossible for all combinations
-                return True
-
-            targets: list[AState | str] = []
-            if possible_true():
-                nf = deepcopy(frame)
-                nf.pc = PC(frame.pc.method, opr.target)
-                targets.append(mk_successor(nf))
-            # false branch
-            nf2 = deepcopy(frame)
-            nf2.pc += 1
-            targets.append(mk_successor(nf2))
-            return targets
+    _hits(pc.method)[pc.offset] = 1
+
+    return handler(state, frame, opr, domain)
     
 
-def many_step(state : dict[PC, AState | str]) -> dict[PC, AState | str]:
-  new_state = dict(state)
-  for k, v in state.items():
-      for s in step(v):
+def many_step(state : dict[PC, AState | str], domain) -> dict[PC, AState | str]:
+  # steps the states present on entry and joins their successors into state in place
+  for k, v in list(state.items()):
+      if not isinstance(v, AState):
+          continue  # terminal outcome, nothing to step
+      for s in step(v, domain):
         if isinstance(s, AState):
-            tgt = s.frames.items[0].pc if s.frames.items else k # target pc
-            prev = new_state.get(tgt)
+            tgt = s.frames[0].pc if s.frames else k # target pc
+            prev = state.get(tgt)
             if prev is None:
-                new_state[tgt] = s
+                state[tgt] = s
             elif isinstance(prev, AState):
+                if s <= prev:
+                    continue  # nothing new, skip the join
                 merged = prev.join(s)  # join with existing state
                 if merged is not None:
-                    new_state[tgt] = merged
+                    state[tgt] = merged
         else:
             # terminal string outcome (terminal state)
-            new_state[k] = s
-  return new_state
+            state[k] = s
+  return state
 
 
 def manystep[AV](sts: StateSet[AV], domain: type[AV]) -> Iterable[AState[AV] | str]:
@@ -500,17 +620,13 @@ def manystep[AV](sts: StateSet[AV], domain: type[AV]) -> Iterable[AState[AV] | s
 
 
 def initialstate_from_method[AV](methodid: jvm.AbsMethodID, domain: type[AV]) -> StateSet[AV]:
-    init_pc = PC(methodid, 0)
-    start_frame = PerVarFrame[AV](locals={}, stack=Stack.empty(), pc=init_pc) # New frame, with the method's starting PC
+    init_pc = _pc(methodid, 0)
     params = methodid.extension.params
-    constraints = {}
+    constraints = {f"local_{i}": domain.top() for i in range(len(params))}
+    # New frame, with the method's starting PC; parameter i lives in local_i
+    start_frame = PerVarFrame[AV](locals=dict(enumerate(constraints)), stack=[], pc=init_pc)
     
-    for i, p in enumerate(params):
-        name = f"local_{i}"
-        constraints[name] = domain.top()
-        start_frame.locals[i] = name
-    
-    state = AState[AV](heap={}, frames=Stack.empty().push(start_frame), constraints=constraints)
+    state = AState[AV](heap={}, frames=[start_frame], constraints=constraints)
     
     return StateSet[AV](
         per_inst={start_frame.pc: state},
@@ -525,16 +641,10 @@ method = jpamb.getmethodid(
     for_science=False
 )
 
-bc = Bytecode(jpamb.Suite(), dict())
-
 sts = initialstate_from_method(method, SignSet)
-all_ops = list(_suite.method_opcodes(method))  # all instructions in the method
-
-
 
 final = set()
 MAX_STEPS = 100
-op_hit = set()
 
 for i in range(MAX_STEPS):
     for s in manystep(sts, SignSet):
@@ -542,13 +652,12 @@ for i in range(MAX_STEPS):
             final.add(s)
         else:
             sts |= s
-            # track visited PCs
-            op_hit.update(s.frames.peek().pc for s in [s])
 
 print(f"The following final states {final} are possible in {MAX_STEPS} steps")
 
 # print instructions that were never reached
-not_hit = [x for x in all_ops if x not in op_hit]
+hits = _hits(method)
+not_hit = [x for i, x in enumerate(_opcodes(method)) if not hits[i]]
 
 print("NOT HIT")
 for op in not_hit:
@@ -567,7 +676,7 @@ def run_analysis_hybrid(sts, domain, max_steps=100, widen_threshold=3):
             if isinstance(s, str):
                 continue
             else:
-                pc = s.frames.peek().pc
+                pc = s.frames[-1].pc
                 old = sts.per_inst.get(pc)
                 sts |= s
                 if old != sts.per_inst[pc]: